@@ -0,0 +1,90 @@
+import numpy as np
+
+from neat.graphs import feed_forward_layers
+
+from compiled_network import ACTIVATIONS
+
+
+# the feed-forward networks of a whole generation, evaluated together as a batch:
+# every network evaluates its nodes in the same order as neat.nn.FeedForwardNetwork,
+# node j of every network is stored in column (inputs + j) of a (population x slots) array
+class BatchNetwork:
+    def __init__(self, num_inputs, weights, biases, responses, activations, output_slots):
+        self.num_inputs = num_inputs
+        self.weights = weights              # (steps, population, slots)
+        self.biases = biases                # (steps, population)
+        self.responses = responses          # (steps, population)
+        self.activations = activations      # per step, list of (activation name, population mask)
+        self.output_slots = output_slots    # (population, outputs)
+
+    # inputs is a (population x inputs) array, or one row per selected network when rows is given
+    def activate(self, inputs, rows=None):
+        if rows is None:
+            rows = slice(None)
+        weights = self.weights[:, rows]
+        values = np.zeros((weights.shape[1], weights.shape[2]))
+        values[:, :self.num_inputs] = inputs
+
+        for step in range(len(weights)):
+            s = np.einsum("ps,ps->p", weights[step], values)
+            z = self.biases[step, rows] + self.responses[step, rows] * s
+            column = self.num_inputs + step
+
+            # usually every node of the step shares the same activation function
+            activations = self.activations[step]
+            if len(activations) == 1:
+                values[:, column] = ACTIVATIONS[activations[0][0]](z)
+            else:
+                for name, mask in activations:
+                    mask = mask[rows]
+                    values[mask, column] = ACTIVATIONS[name](z[mask])
+
+        return values[np.arange(len(values))[:, None], self.output_slots[rows]]
+
+    @staticmethod
+    def create(genomes, config):
+        genome_config = config.genome_config
+        input_keys, output_keys = genome_config.input_keys, genome_config.output_keys
+
+        # gather the evaluation order of every network, the same way neat builds it
+        plans = []
+        for genome in genomes:
+            connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+            nodes = [node for layer in feed_forward_layers(input_keys, output_keys, connections) for node in layer]
+            plans.append((genome, connections, nodes))
+
+        num_inputs = len(input_keys)
+        steps = max([len(nodes) for _, _, nodes in plans] + [0])
+        zero_slot = num_inputs + steps          # never written, outputs that are not evaluated read 0
+        size = len(plans)
+
+        weights = np.zeros((steps, size, zero_slot + 1))
+        biases = np.zeros((steps, size))
+        responses = np.zeros((steps, size))
+        names = np.full((steps, size), None, dtype=object)     # None for the padding of smaller networks
+        output_slots = np.full((size, len(output_keys)), zero_slot)
+
+        for p, (genome, connections, nodes) in enumerate(plans):
+            slots = {key: i for i, key in enumerate(input_keys)}
+            slots.update({node: num_inputs + j for j, node in enumerate(nodes)})
+
+            for j, node in enumerate(nodes):
+                ng = genome.nodes[node]
+                if ng.aggregation != "sum":
+                    raise ValueError(f"Unsupported aggregation for batched networks: {ng.aggregation}")
+                if ng.activation not in ACTIVATIONS:
+                    raise ValueError(f"Unsupported activation for batched networks: {ng.activation}")
+
+                biases[j, p] = ng.bias
+                responses[j, p] = ng.response
+                names[j, p] = ng.activation
+                for inode, onode in connections:
+                    if onode == node:
+                        weights[j, p, slots.get(inode, zero_slot)] += genome.connections[inode, onode].weight
+
+            for o, key in enumerate(output_keys):
+                output_slots[p, o] = slots.get(key, zero_slot)
+
+        # padding columns are never read, so they may go through any activation
+        activations = [[(name, names[j] == name) for name in set(names[j]) - {None}] for j in range(steps)]
+        return BatchNetwork(num_inputs, weights, biases, responses, activations, output_slots)
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import random
+import pickle
+import argparse
+import tracemalloc
+
+import neat
+import numpy as np
+
+from game import *
+from env import FlappyEnv
+from train import play
+from profiler import FrameProfiler
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# run fn once for warm-up, once timed and once more to record the peak memory
+# it allocates (tracing allocations slows it down too much to time the same run)
+def measure(fn):
+    fn()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def load_config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                              os.path.join(LOCAL_DIR, "config-feedforward.txt"))
+
+
+# Bird.move, falling and flapping like a playing bird
+def bench_bird_move(n):
+    def run():
+        bird = Bird(230, 350)
+        for i in range(n):
+            if i % 10 == 0:
+                bird.jump()
+            bird.move()
+    seconds, peak, _ = measure(run)
+    return {"name": "Bird.move", "ops": n, "ops_per_sec": n / seconds, "peak_kb": peak / 1024}
+
+
+# Pipe.collide against birds all around the pipe, touching it or not
+def bench_pipe_collide(n, seed):
+    rng = random.Random(seed)
+    pipe = Pipe(230, 200, 300)
+    birds = []
+    for _ in range(n):
+        bird = Bird(230, 0)
+        bird.x = pipe.x + rng.randint(-150, 150)
+        bird.y = rng.uniform(150, 550)
+        birds.append(bird)
+
+    def run():
+        return sum(pipe.collide(bird) for bird in birds)
+    seconds, peak, hits = measure(run)
+    return {"name": "Pipe.collide", "ops": n, "hits": hits, "ops_per_sec": n / seconds, "peak_kb": peak / 1024}
+
+
+# one headless generation of eval_genomes with a population of the given size
+def bench_generation(config, size, seed):
+    config.pop_size = size
+    random.seed(seed)
+    genomes = list(neat.Population(config).population.values())
+
+    # genomes stay untouched, so every run plays exactly the same game
+    profilers = []
+    def run():
+        profiler = FrameProfiler()
+        profilers.append(profiler)
+        return play(genomes, config, seed, profiler=profiler)
+    seconds, peak, _ = measure(run)
+    profiler = profilers[-1]
+    return {"name": f"generation[{size}]", "frames": profiler.frames, "bird_frames": profiler.bird_frames,
+            "fps": profiler.frames / seconds, "bird_frames_per_sec": profiler.bird_frames / seconds,
+            "seconds": seconds, "peak_kb": peak / 1024}
+
+
+# the best model flying alone like test_AI, without the window
+def bench_best_model(config, frames, seed):
+    with open(os.path.join(LOCAL_DIR, "model", "best.pickle"), "rb") as f:
+        net = neat.nn.FeedForwardNetwork.create(pickle.load(f), config)
+
+    def run():
+        env = FlappyEnv(1, max_score=None)
+        obs = env.reset(seed)
+        for _ in range(frames):
+            if env.done:
+                obs = env.reset(seed)
+            obs, rewards, dones, info = env.step([net.activate(obs[0])[0] > 0.5])
+    seconds, peak, _ = measure(run)
+    return {"name": "best model", "frames": frames, "fps": frames / seconds, "peak_kb": peak / 1024}
+
+
+def format_result(result):
+    rates = [f"{result[key]:,.0f} {label}" for key, label in
+             (("ops_per_sec", "ops/sec"), ("fps", "frames/sec"), ("bird_frames_per_sec", "bird frames/sec"))
+             if key in result]
+    return f"{result['name']:<20} {', '.join(rates):<50} peak {result['peak_kb']:,.0f} KB"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the simulation, collision and inference throughput")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the pipes, genomes and bird positions")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="population sizes of the generation benchmark")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a fast sanity check")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    scale = 10 if args.quick else 1
+    config = load_config()
+
+    results = [
+        bench_bird_move(100000 // scale),
+        bench_pipe_collide(20000 // scale, args.seed),
+        *(bench_generation(config, size, args.seed) for size in args.sizes),
+        bench_best_model(config, 10000 // scale, args.seed),
+    ]
+
+    print(f"Python {sys.version.split()[0]}, numpy {np.__version__}, pygame {pygame.version.ver}, seed {args.seed}")
+    for result in results:
+        print(format_result(result))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,69 @@
+import os
+import re
+import gzip
+import glob
+import pickle
+import random
+import itertools
+
+import neat
+
+
+# saves the population every few generations or seconds, written to a temporary
+# file first and then renamed, so a run that gets killed never leaves a broken checkpoint.
+# The next genome key and the ancestors of the population's reproduction are saved too,
+# otherwise a resumed run hands out the keys of existing genomes again
+class AtomicCheckpointer(neat.Checkpointer):
+    def __init__(self, generation_interval=5, time_interval_seconds=None, directory="checkpoints"):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(generation_interval, time_interval_seconds,
+                         os.path.join(directory, "neat-checkpoint-"))
+        self.best_genome = None
+        self.reproduction = None    # the Population's reproduction, set by the caller
+
+    # remember the best genome so far, so a resumed run still knows it
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.best_genome is None or best_genome.fitness > self.best_genome.fitness:
+            self.best_genome = best_genome
+
+    # the saved population is the one of the next generation, so it is stored under that number
+    def save_checkpoint(self, config, population, species_set, generation):
+        filename = f"{self.filename_prefix}{generation + 1}"
+        print(f"Saving checkpoint to {filename}")
+
+        # reading the next key uses it up, the indexer carries on from the same key
+        next_key = next(self.reproduction.genome_indexer)
+        self.reproduction.genome_indexer = itertools.count(next_key)
+
+        data = (generation + 1, config, population, species_set, random.getstate(), self.best_genome,
+                next_key, self.reproduction.ancestors)
+        with gzip.open(filename + ".tmp", "wb", compresslevel=9) as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        with gzip.open(filename) as f:
+            data = pickle.load(f)
+
+        # checkpoints from before the reproduction state was saved go on after the highest key
+        if len(data) == 6:
+            keys = list(data[2]) + ([data[5].key] if data[5] is not None else [])
+            data += (max(keys) + 1, {})
+        generation, config, population, species_set, rndstate, best_genome, next_key, ancestors = data
+
+        random.setstate(rndstate)
+        P = neat.Population(config, (population, species_set, generation))
+        P.best_genome = best_genome
+        P.reproduction.genome_indexer = itertools.count(next_key)
+        P.reproduction.ancestors = ancestors
+        return P
+
+    # the checkpoint of the latest generation in the directory, None if there is none
+    @staticmethod
+    def latest_checkpoint(directory="checkpoints"):
+        files = glob.glob(os.path.join(directory, "neat-checkpoint-*"))
+        files = [f for f in files if re.fullmatch(r"neat-checkpoint-\d+", os.path.basename(f))]
+        if not files:
+            return None
+        return max(files, key=lambda f: int(f.rsplit("-", 1)[1]))
@@ -0,0 +1,109 @@
+import math
+import json
+
+import numpy as np
+
+FORMAT = "flappy-bird-network"
+FORMAT_VERSION = 1
+
+
+# numpy versions of the neat activation functions, scaled and clamped the same way
+ACTIVATIONS = {
+    "sigmoid":  lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    "tanh":     lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    "relu":     lambda z: np.maximum(z, 0.0),
+    "identity": lambda z: z,
+    "clamped":  lambda z: np.clip(z, -1.0, 1.0),
+    "abs":      np.abs,
+    "square":   np.square,
+}
+
+# the same functions on plain floats, for evaluating one input at a time
+SCALAR_ACTIVATIONS = {
+    "sigmoid":  lambda z: 1.0 / (1.0 + math.exp(-max(-60.0, min(60.0, 5.0 * z)))),
+    "tanh":     lambda z: math.tanh(max(-60.0, min(60.0, 2.5 * z))),
+    "relu":     lambda z: z if z > 0.0 else 0.0,
+    "identity": lambda z: z,
+    "clamped":  lambda z: max(-1.0, min(1.0, z)),
+    "abs":      abs,
+    "square":   lambda z: z ** 2,
+}
+
+
+# a feed-forward network flattened into arrays, evaluated without neat: node j reads
+# the links link_offsets[j]:link_offsets[j + 1] from value slots (inputs first, then
+# the nodes in evaluation order) and outputs read slot output_slots[o], -1 reads 0.
+# Gives the same outputs as the neat.nn.FeedForwardNetwork it was exported from
+class CompiledNetwork:
+    def __init__(self, num_inputs, biases, responses, activations, link_offsets,
+                 link_sources, link_weights, output_slots, metadata=None):
+        self.num_inputs = int(num_inputs)
+        self.biases = np.asarray(biases, dtype=float)
+        self.responses = np.asarray(responses, dtype=float)
+        self.activations = [str(name) for name in activations]
+        self.link_offsets = np.asarray(link_offsets, dtype=int)
+        self.link_sources = np.asarray(link_sources, dtype=int)
+        self.link_weights = np.asarray(link_weights, dtype=float)
+        self.output_slots = np.asarray(output_slots, dtype=int)
+        self.metadata = metadata or {}
+
+        for name in self.activations:
+            if name not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {name}")
+
+        # the nodes as plain python tuples, so activate() doesn't touch numpy
+        self.nodes = [(SCALAR_ACTIVATIONS[name], float(bias), float(response),
+                       [(int(s), float(w)) for s, w in zip(self.link_sources[lo:hi], self.link_weights[lo:hi])])
+                      for name, bias, response, lo, hi in zip(self.activations, self.biases, self.responses,
+                                                              self.link_offsets[:-1], self.link_offsets[1:])]
+        self.outputs = [int(slot) for slot in self.output_slots]
+
+    # outputs for one set of inputs, as a list like FeedForwardNetwork.activate
+    def activate(self, inputs):
+        if len(inputs) != self.num_inputs:
+            raise RuntimeError(f"Expected {self.num_inputs} inputs, got {len(inputs)}")
+
+        values = list(inputs)
+        for activation, bias, response, links in self.nodes:
+            values.append(activation(bias + response * sum([values[source] * weight for source, weight in links])))
+        values.append(0.0)      # read by the outputs at slot -1
+        return [values[slot] for slot in self.outputs]
+
+    # outputs for a (rows x inputs) array, one row per set of inputs
+    def activate_batch(self, inputs):
+        inputs = np.asarray(inputs, dtype=float)
+        values = np.zeros((len(inputs), self.num_inputs + len(self.nodes) + 1))    # the last column stays 0
+        values[:, :self.num_inputs] = inputs
+
+        for j, name in enumerate(self.activations):
+            lo, hi = self.link_offsets[j], self.link_offsets[j + 1]
+            s = values[:, self.link_sources[lo:hi]] @ self.link_weights[lo:hi]
+            values[:, self.num_inputs + j] = ACTIVATIONS[name](self.biases[j] + self.responses[j] * s)
+        return values[:, self.output_slots]
+
+    # pickled as its arrays (the activations are lambdas), to send it to worker processes
+    def __reduce__(self):
+        return (CompiledNetwork, (self.num_inputs, self.biases, self.responses, self.activations, self.link_offsets,
+                                  self.link_sources, self.link_weights, self.output_slots, self.metadata))
+
+    # a small json file, loaded much faster than the pickled genome and its neat config
+    def save(self, path):
+        model = {"format": FORMAT, "version": FORMAT_VERSION, "num_inputs": self.num_inputs,
+                 "biases": self.biases.tolist(), "responses": self.responses.tolist(),
+                 "activations": self.activations, "link_offsets": self.link_offsets.tolist(),
+                 "link_sources": self.link_sources.tolist(), "link_weights": self.link_weights.tolist(),
+                 "output_slots": self.output_slots.tolist(), "metadata": self.metadata}
+        with open(path, "w") as f:
+            json.dump(model, f, indent=1)
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            model = json.load(f)
+        if model.get("format") != FORMAT:
+            raise ValueError(f"{path} is not an exported network")
+        if model["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model format version {model['version']}, expected {FORMAT_VERSION}")
+        return CompiledNetwork(model["num_inputs"], model["biases"], model["responses"], model["activations"],
+                               model["link_offsets"], model["link_sources"], model["link_weights"],
+                               model["output_slots"], model["metadata"])
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+# a seeded layout of pipes: the same seed always gives the same heights and gaps,
+# so every bird, worker and replay of an episode flies through the same pipes
+class Course:
+    BLOCK = 128                 # pipes generated at a time, a training episode fits in one block
+    HEIGHT_RANGE = (50, 450)    # same range as Pipe.set_height
+
+    def __init__(self, seed=None, gap_range=(180, 200), first_gap=200):
+        self.seed = seed
+        self.gap_range = gap_range
+        self.first_gap = first_gap
+        self.rng = np.random.default_rng(seed)
+        self.heights = np.empty(0, dtype=int)
+        self.gaps = np.empty(0, dtype=int)
+        self.extend()
+
+    def __len__(self):
+        return len(self.heights)
+
+    # precompute the next block of pipes, the arrays stay read-only
+    def extend(self):
+        heights = self.rng.integers(self.HEIGHT_RANGE[0], self.HEIGHT_RANGE[1], self.BLOCK)
+        gaps = self.rng.integers(self.gap_range[0], self.gap_range[1] + 1, self.BLOCK)
+        if len(self.gaps) == 0:
+            gaps[0] = self.first_gap
+
+        self.heights = np.concatenate((self.heights, heights))
+        self.gaps = np.concatenate((self.gaps, gaps))
+        self.heights.flags.writeable = False
+        self.gaps.flags.writeable = False
+
+    # (gap, height) of the i-th pipe, in the order Pipe(x, gap, height) takes them
+    def layout(self, i):
+        while i >= len(self):
+            self.extend()
+        return int(self.gaps[i]), int(self.heights[i])
@@ -0,0 +1,233 @@
+import time
+import itertools
+import collections
+
+import numpy as np
+
+from game import *
+from course import Course
+from population import BirdPopulation
+from profiler import FrameProfiler
+
+
+# the game as a learning environment, with the rules the AI is trained and tested with:
+# reset(seed) starts an episode and step(actions) plays one frame, returning the
+# observations, rewards and done flags of the birds. All the birds of an env fly
+# through the same pipes, a bird that hits a pipe, the floor or flies too high is done.
+# An observation is what the networks see: (y, distance to the top pipe, distance to the bottom pipe).
+# The pipes are kept in a deque ordered by x, pipe_idx points at the next pipe to pass
+class FlappyEnv:
+    BIRD_X = 230
+    BIRD_Y = 350
+    FIRST_PIPE_X = 700
+    ALIVE_REWARD = 0.1      # every frame a bird stays alive
+    CRASH_REWARD = -1       # hitting a pipe
+    PIPE_REWARD = 5         # every pipe passed, for the birds still alive
+    MAX_SCORE = 75          # the episode ends once the score goes above this, None to play on
+
+    def __init__(self, num_birds=1, gap_range=(180, 200), max_score=MAX_SCORE, profiler=None):
+        self.num_birds = num_birds
+        self.gap_range = gap_range
+        self.max_score = max_score
+        self.profiler = FrameProfiler() if profiler is None else profiler
+        self.birds = None
+        self.pipes = ()
+        self.done = True
+
+    # start a new episode, the seed sets the pipes (random when None)
+    def reset(self, seed=None):
+        self.course = Course(seed, self.gap_range)
+        self.base   = Base(FLOOR)
+
+        # the birds and pipes of the last episode are reused
+        if self.birds is None:
+            self.birds = BirdPopulation(self.num_birds, self.BIRD_X, self.BIRD_Y)
+        else:
+            self.birds.reset(np.ones(self.num_birds, dtype=bool))
+        for pipe in self.pipes:
+            PIPES.release(pipe)
+        self.pipes  = collections.deque([PIPES.acquire(self.FIRST_PIPE_X, *self.course.layout(0))])
+        self.pipe_idx = 0
+        self.placed = 1
+        self.score  = 0
+        self.frames = 0
+        self.done   = False
+        self.begin_frame()
+        return self.observe()
+
+    # the first half of a frame, up to where the birds decide to jump or not
+    def begin_frame(self):
+        t = time.perf_counter()
+
+        # the next pipe is the network input, move on once the birds are past it
+        pipes = self.pipes
+        while self.pipe_idx + 1 < len(pipes) and self.birds.x > pipes[self.pipe_idx].x + PIPE_WIDTH:
+            self.pipe_idx += 1
+
+        self.birds.move()
+        self.profiler.lap("physics", t)
+
+    def observe(self):
+        y = self.birds.y
+        pipe = self.pipes[self.pipe_idx]
+        return np.column_stack((y, np.abs(y - pipe.height), np.abs(y - pipe.bottom)))
+
+    # play the rest of the frame with the given jump flags, one per bird, and the first
+    # half of the next one. Returns (observations, rewards, done flags, info)
+    def step(self, actions):
+        if self.done:
+            raise RuntimeError("step() called on a finished episode, call reset() first")
+
+        profiler = self.profiler
+        birds = self.birds
+        profiler.frame(len(birds))
+        self.frames += 1
+        t = time.perf_counter()
+
+        rewards = np.where(birds.alive, self.ALIVE_REWARD, 0.0)
+        birds.jump(np.asarray(actions, dtype=bool))
+        self.base.move()
+        t = profiler.lap("physics", t)
+
+        pipes = self.pipes
+        for pipe in pipes:
+            pipe.move()
+        t = profiler.lap("physics", t)
+
+        # the pipes before the next one are behind the birds, only the ones from it up
+        # to the front of the birds can be hit or passed
+        add_pipe = False
+        for i in range(self.pipe_idx, len(pipes)):
+            pipe = pipes[i]
+            if pipe.x >= birds.x + BIRD_WIDTH:
+                break
+
+            hits = birds.collide(pipe)
+            rewards[hits] += self.CRASH_REWARD
+            birds.kill(hits)
+
+            if not pipe.passed and pipe.x < birds.x:
+                pipe.passed = True
+                add_pipe = True
+        t = profiler.lap("collision", t)
+
+        # the pipe only counts if a bird got through it
+        if add_pipe:
+            if len(birds):
+                self.score += 1
+            rewards[birds.alive] += self.PIPE_REWARD
+            pipes.append(PIPES.acquire(WIN_WIDTH, *self.course.layout(self.placed)))
+            self.placed += 1
+
+        # pipes leave the screen in order, the next pipe keeps its place
+        while pipes[0].x + PIPE_WIDTH < 0:
+            PIPES.release(pipes.popleft())
+            self.pipe_idx -= 1
+        t = profiler.lap("pipes", t)
+
+        birds.kill(birds.out_of_bounds())
+        profiler.lap("physics", t)
+
+        self.done = len(birds) == 0 or (self.max_score is not None and self.score > self.max_score)
+        if not self.done:
+            self.begin_frame()
+        return self.observe(), rewards, ~birds.alive, {"score": self.score}
+
+
+# many independent single bird environments stepped in one call: every env has its own
+# pipes, but the birds move and collide together as one BirdPopulation. A finished env
+# is reset straight away, its observation is then the first one of the new episode
+class VectorFlappyEnv:
+    def __init__(self, num_envs, gap_range=(180, 200), max_score=FlappyEnv.MAX_SCORE):
+        self.num_envs = num_envs
+        self.gap_range = gap_range
+        self.max_score = max_score
+        self.seeds = itertools.repeat(None)
+
+    # start an episode in every env, with the seeds seed, seed + 1, ... The envs that
+    # finish later are reset with the seeds that follow, so a run is reproducible
+    def reset(self, seed=None):
+        self.seeds  = itertools.repeat(None) if seed is None else itertools.count(seed)
+        self.birds  = BirdPopulation(self.num_envs, FlappyEnv.BIRD_X, FlappyEnv.BIRD_Y)
+        self.score  = np.zeros(self.num_envs, dtype=int)
+        self.courses = [None] * self.num_envs
+        self.pipes   = [None] * self.num_envs
+        self.pipe_idx = np.zeros(self.num_envs, dtype=int)
+        self.placed  = np.ones(self.num_envs, dtype=int)
+        for i in range(self.num_envs):
+            self.reset_env(i)
+        self.begin_frame()
+        return self.observe()
+
+    def reset_env(self, i):
+        self.courses[i] = Course(next(self.seeds), self.gap_range)
+        for pipe in self.pipes[i] or ():
+            PIPES.release(pipe)
+        self.pipes[i] = collections.deque([PIPES.acquire(FlappyEnv.FIRST_PIPE_X, *self.courses[i].layout(0))])
+        self.pipe_idx[i] = 0
+        self.placed[i] = 1
+        self.score[i] = 0
+
+    # same as FlappyEnv.begin_frame, the pipe each bird looks at is kept as arrays
+    def begin_frame(self):
+        x = self.birds.x
+        for i, pipes in enumerate(self.pipes):
+            while self.pipe_idx[i] + 1 < len(pipes) and x > pipes[self.pipe_idx[i]].x + PIPE_WIDTH:
+                self.pipe_idx[i] += 1
+        next_pipes = [pipes[i] for pipes, i in zip(self.pipes, self.pipe_idx)]
+        self.next_height = np.array([pipe.height for pipe in next_pipes])
+        self.next_bottom = np.array([pipe.bottom for pipe in next_pipes])
+        self.birds.move()
+
+    def observe(self):
+        y = self.birds.y
+        return np.column_stack((y, np.abs(y - self.next_height), np.abs(y - self.next_bottom)))
+
+    # one frame of every env with one jump flag per env, returns (observations, rewards,
+    # done flags, info), info["score"] holds the score of the episodes that just ended
+    def step(self, actions):
+        birds = self.birds
+        rewards = np.full(self.num_envs, FlappyEnv.ALIVE_REWARD)
+        birds.jump(np.asarray(actions, dtype=bool))
+
+        # the pipes are spaced so that only the next one can be hit or passed
+        passed = np.zeros(self.num_envs, dtype=bool)
+        pipe_x = np.full(self.num_envs, WIN_WIDTH)
+        pipe_top = np.zeros(self.num_envs, dtype=int)
+        pipe_bottom = np.zeros(self.num_envs, dtype=int)
+        for i, pipes in enumerate(self.pipes):
+            for pipe in pipes:
+                pipe.move()
+            pipe = pipes[self.pipe_idx[i]]
+            pipe_x[i], pipe_top[i], pipe_bottom[i] = pipe.x, pipe.top, pipe.bottom
+            if not pipe.passed and pipe.x < birds.x:
+                pipe.passed = True
+                passed[i] = True
+
+        hits = birds.collide_pipes(pipe_x, pipe_top, pipe_bottom)
+        rewards[hits] += FlappyEnv.CRASH_REWARD
+        birds.kill(hits)
+
+        # a pipe only counts for the birds that got through it
+        passed &= birds.alive
+        self.score[passed] += 1
+        rewards[passed] += FlappyEnv.PIPE_REWARD
+        for i in np.flatnonzero(passed):
+            self.pipes[i].append(PIPES.acquire(WIN_WIDTH, *self.courses[i].layout(self.placed[i])))
+            self.placed[i] += 1
+        for i, pipes in enumerate(self.pipes):
+            if pipes[0].x + PIPE_WIDTH < 0:
+                PIPES.release(pipes.popleft())
+                self.pipe_idx[i] -= 1
+
+        birds.kill(birds.out_of_bounds())
+        dones = ~birds.alive
+        if self.max_score is not None:
+            dones |= self.score > self.max_score
+        info = {"score": self.score.copy()}
+
+        for i in np.flatnonzero(dones):
+            self.reset_env(i)
+        birds.reset(dones)
+        self.begin_frame()
+        return self.observe(), rewards, dones, info
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import multiprocessing
+
+import numpy as np
+
+# the report goes to stdout, keep pygame's banner out of it
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from env import FlappyEnv, VectorFlappyEnv
+from compiled_network import CompiledNetwork
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+CAUSES = ("pipe", "bounds", "max_score")
+
+
+# the network of an exported .json model, or of a pickled genome compiled with its neat config
+def load_network(model_path, config_path):
+    if model_path.endswith(".json"):
+        return CompiledNetwork.load(model_path)
+
+    from export_model import compile_genome, load_config
+    with open(model_path, "rb") as f:
+        genome = pickle.load(f)
+    return compile_genome(genome, load_config(config_path))
+
+
+# play one episode on each of the courses first_seed .. first_seed + count - 1, batch of
+# them at a time in a VectorFlappyEnv, the network deciding for all the birds in one call.
+# Returns the score, frames and how each episode ended (an index in CAUSES), by seed
+def play_courses(net, first_seed, count, max_score=FlappyEnv.MAX_SCORE, batch=256):
+    scores = np.zeros(count, dtype=int)
+    frames = np.zeros(count, dtype=int)
+    causes = np.zeros(count, dtype=int)
+
+    num_envs = min(batch, count)
+    env = VectorFlappyEnv(num_envs, max_score=max_score)
+    obs = env.reset(first_seed)
+
+    # the env resets finished games in order with the seeds that follow, envs that get
+    # a seed past the last course keep playing until the others are done, but aren't counted
+    seed_of = np.arange(num_envs)
+    next_seed = num_envs
+    played = np.zeros(num_envs, dtype=int)
+    remaining = count
+    while remaining:
+        obs, rewards, dones, info = env.step(net.activate_batch(obs)[:, 0] > 0.5)
+        played += 1
+
+        for i in np.flatnonzero(dones):
+            if seed_of[i] < count:
+                score = info["score"][i]
+                scores[seed_of[i]] = score
+                frames[seed_of[i]] = played[i]
+                if max_score is not None and score > max_score:
+                    causes[seed_of[i]] = CAUSES.index("max_score")
+                elif rewards[i] < FlappyEnv.ALIVE_REWARD:
+                    causes[seed_of[i]] = CAUSES.index("pipe")
+                else:
+                    causes[seed_of[i]] = CAUSES.index("bounds")
+                remaining -= 1
+            seed_of[i] = next_seed
+            next_seed += 1
+            played[i] = 0
+    return scores, frames, causes
+
+
+# play_courses in a worker process, the network is sent along with the courses
+def play_shard(net, first_seed, count, max_score, batch):
+    return play_courses(net, first_seed, count, max_score, batch)
+
+
+def distribution(values):
+    values = np.asarray(values, dtype=float)
+    stats = {"mean": float(values.mean()), "std": float(values.std()),
+             "min": float(values.min()), "max": float(values.max())}
+    stats.update({f"p{p}": float(q) for p, q in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+    return stats
+
+
+# score and episode length distributions over all the courses, with a 95% confidence
+# interval of the mean score and a histogram of the frame the model crashed at
+def summarise(scores, frames, causes, bin_frames=100):
+    n = len(scores)
+    score = distribution(scores)
+    margin = 1.96 * score["std"] / np.sqrt(n)
+    score["mean_ci95"] = [score["mean"] - margin, score["mean"] + margin]
+
+    crashed = frames[causes != CAUSES.index("max_score")]
+    edges = np.arange(0, (crashed.max(initial=0) // bin_frames + 1) * bin_frames + 1, bin_frames)
+    counts, edges = np.histogram(crashed, bins=edges)
+    return {
+        "episodes": n,
+        "score": score,
+        "frames": distribution(frames),
+        "causes": {cause: int(np.sum(causes == i)) for i, cause in enumerate(CAUSES)},
+        "failure_frames": {"bin_frames": bin_frames,
+                           "bins": [[int(lo), int(count)] for lo, count in zip(edges[:-1], counts) if count]},
+    }
+
+
+# play the courses seed .. seed + episodes - 1 split in contiguous shards over the workers,
+# so the results don't depend on the number of workers
+def evaluate(net, episodes, seed=0, workers=1, max_score=FlappyEnv.MAX_SCORE, batch=256):
+    size = -(-episodes // max(workers, 1))
+    shards = [(net, seed + start, min(size, episodes - start), max_score, batch)
+              for start in range(0, episodes, size)]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(play_shard, shards)
+    else:
+        results = [play_shard(*shard) for shard in shards]
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+# Path of current working directory
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a trained model headless on many seeded courses and report its score distribution")
+    parser.add_argument("--model", default=os.path.join(LOCAL_DIR, "model", "best.pickle"), help="pickled genome or exported .json model")
+    parser.add_argument("--config", default=os.path.join(LOCAL_DIR, "config-feedforward.txt"), help="neat config of a pickled genome")
+    parser.add_argument("--episodes", type=int, default=1000, help="number of courses to play, one episode each")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first course, the others follow")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="play the courses on this many processes")
+    parser.add_argument("--max-score", type=int, default=FlappyEnv.MAX_SCORE, help="an episode ends once the score goes above this")
+    parser.add_argument("--batch", type=int, default=256, help="courses played together by each worker")
+    parser.add_argument("--bin-frames", type=int, default=100, help="width of the failure frame histogram bins")
+    parser.add_argument("--json", default=None, help="write the report to this file instead of stdout")
+    parser.add_argument("--min-mean-score", type=float, default=None, help="exit with status 1 if the mean score is below this")
+    args = parser.parse_args()
+    if args.episodes < 1:
+        parser.error("--episodes must be at least 1")
+
+    net = load_network(args.model, args.config)
+    start = time.perf_counter()
+    scores, frames, causes = evaluate(net, args.episodes, args.seed, args.workers, args.max_score, args.batch)
+    seconds = time.perf_counter() - start
+
+    report = {"model": args.model, "seed": args.seed, "max_score": args.max_score, "seconds": seconds,
+              "frames_per_sec": float(frames.sum()) / seconds, **summarise(scores, frames, causes, args.bin_frames)}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.min_mean_score is not None and report["score"]["mean"] < args.min_mean_score:
+        print(f"Mean score {report['score']['mean']:.2f} is below {args.min_mean_score}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,62 @@
+import os
+import pickle
+import argparse
+
+import neat
+from neat.graphs import feed_forward_layers
+
+from compiled_network import CompiledNetwork
+
+
+# flatten a genome into a CompiledNetwork, with the nodes and the links of every node
+# in the order neat.nn.FeedForwardNetwork evaluates them so the outputs are identical
+def compile_genome(genome, config):
+    genome_config = config.genome_config
+    input_keys, output_keys = genome_config.input_keys, genome_config.output_keys
+
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    nodes = [node for layer in feed_forward_layers(input_keys, output_keys, connections) for node in layer]
+    slots = {key: i for i, key in enumerate(input_keys)}
+    slots.update({node: len(input_keys) + j for j, node in enumerate(nodes)})
+
+    biases, responses, activations = [], [], []
+    link_offsets, link_sources, link_weights = [0], [], []
+    for node in nodes:
+        ng = genome.nodes[node]
+        if ng.aggregation != "sum":
+            raise ValueError(f"Unsupported aggregation for compiled networks: {ng.aggregation}")
+
+        biases.append(ng.bias)
+        responses.append(ng.response)
+        activations.append(ng.activation)
+        for inode, onode in connections:
+            if onode == node and inode in slots:
+                link_sources.append(slots[inode])
+                link_weights.append(genome.connections[inode, onode].weight)
+        link_offsets.append(len(link_sources))
+
+    output_slots = [slots.get(key, -1) for key in output_keys]
+    return CompiledNetwork(len(input_keys), biases, responses, activations, link_offsets,
+                           link_sources, link_weights, output_slots,
+                           {"genome_key": genome.key, "fitness": float(genome.fitness or 0.0)})
+
+
+def load_config(config_path):
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+
+
+# Path of current working directory
+if __name__ == '__main__':
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export a trained genome to the array format main.py loads without neat")
+    parser.add_argument("--model", default=os.path.join(local_dir, "model", "best.pickle"), help="pickled genome")
+    parser.add_argument("--config", default=os.path.join(local_dir, "config-feedforward.txt"), help="neat config the genome was trained with")
+    parser.add_argument("--out", default=os.path.join(local_dir, "model", "best.json"), help="file to write")
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        genome = pickle.load(f)
+    network = compile_genome(genome, load_config(args.config))
+    network.save(args.out)
+    print(f"Exported {len(network.nodes)} nodes and {len(network.link_weights)} links to {args.out}")
@@ -0,0 +1,49 @@
+import hashlib
+import collections
+
+
+# hash of the network a genome builds: its nodes and enabled connections with their
+# parameters, so a genome copied unchanged into the next generation (elitism) hashes
+# the same as before whatever its key
+def genome_hash(genome):
+    digest = hashlib.blake2b(digest_size=16)
+    for key in sorted(genome.nodes):
+        node = genome.nodes[key]
+        digest.update(repr((key, node.bias, node.response, node.activation, node.aggregation)).encode())
+    for key in sorted(genome.connections):
+        connection = genome.connections[key]
+        if connection.enabled:
+            digest.update(repr((key, connection.weight)).encode())
+    return digest.hexdigest()
+
+
+# fitness of the genomes already played, keyed by genome structure, course seed and
+# episode policy, the least recently used entries are dropped above max_size
+class FitnessCache:
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(genome, seed, policy):
+        return genome_hash(genome), seed, str(policy)
+
+    # the cached fitness, None when the genome wasn't played on that course yet
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
@@ -2,38 +2,230 @@ import pygame
 import random
 import os
 
+from course import Course
+from renderer import Renderer
+from timestep import FixedTimestep
+
 # constants
+FPS = 30            # frames drawn per second
+TICK_RATE = 30      # physics steps per second, the game moves this fast whatever the frame rate
 FLOOR = 730
 WIN_WIDTH  = 600
 WIN_HEIGHT = 800
 
-pygame.font.init()
-STAT_FONT = pygame.font.SysFont("comicsans", 50)
-END_FONT  = pygame.font.SysFont("comicsans", 70)
+# sprite sizes (after scale2x), the physics only needs these and never the images
+BIRD_WIDTH = 68
+BIRD_HEIGHT = 48
+PIPE_WIDTH = 104
+PIPE_HEIGHT = 640
+BASE_WIDTH = 672
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+FONT_SIZES = {"stat": 50, "end": 70}
+
+# rendering resources, nothing is opened or loaded until a renderer asks for it
+_window = None
+_fonts  = {}
+_images = {}
+_sprites = {}
+_masks  = {}
+_rotated = {}
+_renderer = None
+
+# every tilt a bird can reach: 25, 0 or multiples of ROT_VEL below them, down to -100
+BIRD_TILTS = range(-100, 30, 5)
+
+
+# load a sprite from the assets folder, this works without a display
+def load_image(name):
+    if name not in _images:
+        _images[name] = pygame.transform.scale2x(pygame.image.load(os.path.join(ASSET_DIR, name)))
+    return _images[name]
+
 
-WIN = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
+# the three animation frames of the bird
+def bird_images():
+    return [load_image(f"bird{i}.png") for i in range(1, 4)]
 
-BG_IMAGE = pygame.transform.scale(pygame.image.load(os.path.join("assets", "bg.png")).convert_alpha(), (600, 900))
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("assets", "pipe.png")).convert_alpha())
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("assets", "base.png")).convert_alpha())
-bird_img = [pygame.transform.scale2x(pygame.image.load(os.path.join("assets", f"bird{i}.png"))) for i in range(1, 4)]
+
+# rotated bird sprites and the offset of their top-left corner from the unrotated one,
+# built for every frame and reachable tilt on first use so drawing never rotates
+def rotated_bird(frame, tilt):
+    if not _rotated:
+        for f in range(3):
+            for t in BIRD_TILTS:
+                _rotated[f, t] = rotate_center(get_sprites()["birds"][f], t)
+    if (frame, tilt) not in _rotated:
+        _rotated[frame, tilt] = rotate_center(get_sprites()["birds"][frame], tilt)
+    return _rotated[frame, tilt]
+
+
+# rotate an image around its center, returns it with the offset of its top left corner
+def rotate_center(image, angle):
+    rotated_image = pygame.transform.rotate(image, angle)
+    new_rect = rotated_image.get_rect(center=image.get_rect().center)
+    return rotated_image, new_rect.topleft
+
+
+# pygame rects round coordinates half away from zero
+def rect_round(value):
+    return int(value + 0.5) if value >= 0 else -int(0.5 - value)
+
+
+# draw a bird frame tilted by the given angle, looked up in the rotation atlas
+def draw_bird(win, frame, x, y, tilt):
+    image, (dx, dy) = rotated_bird(frame, tilt)
+    win.blit(image, (rect_round(x) + dx, rect_round(y) + dy))
+
+
+# collision mask of a bird frame, built once per (frame, tilt) and then shared
+def bird_mask(frame, tilt=0):
+    key = ("bird", frame, tilt)
+    if key not in _masks:
+        img = bird_images()[frame]
+        if tilt:
+            img = pygame.transform.rotate(img, tilt)
+        _masks[key] = pygame.mask.from_surface(img)
+    return _masks[key]
+
+
+# collision masks of the top (flipped) and bottom pipe, built once
+def pipe_masks():
+    if "pipe" not in _masks:
+        pipe_img = load_image("pipe.png")
+        _masks["pipe"] = (pygame.mask.from_surface(pygame.transform.flip(pipe_img, False, True)),
+                          pygame.mask.from_surface(pipe_img))
+    return _masks["pipe"]
+
+
+# the largest rectangle of solid pixels in a mask, whatever overlaps it overlaps the mask
+def solid_rect(mask):
+    width, height = mask.get_size()
+    heights = [0] * (width + 1)     # solid pixels above and including the current row, per column
+    best = pygame.Rect(0, 0, 0, 0)
+    for y in range(height):
+        for x in range(width):
+            heights[x] = heights[x] + 1 if mask.get_at((x, y)) else 0
+
+        # largest rectangle under the histogram of the row
+        stack = []
+        for x, h in enumerate(heights):
+            start = x
+            while stack and stack[-1][1] >= h:
+                start, top = stack.pop()
+                if top * (x - start) > best.width * best.height:
+                    best = pygame.Rect(start, y - top + 1, x - start, top)
+            stack.append((start, h))
+    return best
+
+
+# (bounding box, largest solid box) of a mask as (left, top, right, bottom) tuples relative
+# to its top-left corner, plain ints are much cheaper to compare than Rects
+def mask_boxes(mask):
+    bounds = mask.get_bounding_rects()
+    if not bounds:
+        return (0, 0, 0, 0), (0, 0, 0, 0)
+    bounds = bounds[0].unionall(bounds[1:])
+    core = solid_rect(mask)
+    return (bounds.left, bounds.top, bounds.right, bounds.bottom), (core.left, core.top, core.right, core.bottom)
+
+
+# collision boxes of a bird frame, built once
+def bird_boxes(frame):
+    key = ("bird boxes", frame)
+    if key not in _masks:
+        _masks[key] = mask_boxes(bird_mask(frame))
+    return _masks[key]
+
+
+# collision boxes of the top and bottom pipe, built once
+def pipe_boxes():
+    if "pipe boxes" not in _masks:
+        _masks["pipe boxes"] = tuple(mask_boxes(mask) for mask in pipe_masks())
+    return _masks["pipe boxes"]
+
+
+# True if two boxes offset by (dx, dy) share some area
+def boxes_overlap(a, b, dx, dy):
+    return a[0] < b[2] + dx and b[0] + dx < a[2] and a[1] < b[3] + dy and b[1] + dy < a[3]
+
+
+# open the game window the first time it is needed
+def get_window():
+    global _window
+    if _window is None:
+        _window = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        pygame.display.set_caption("Flappy Bird")
+    return _window
+
+
+# the renderer that draws the frames of the game window
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = Renderer(get_window(), get_sprites()["bg"])
+    return _renderer
+
+
+# "stat" font for labels and "end" font for titles
+def get_font(name="stat"):
+    if name not in _fonts:
+        pygame.font.init()
+        _fonts[name] = pygame.font.SysFont("comicsans", FONT_SIZES[name])
+    return _fonts[name]
+
+
+# display-ready surfaces for drawing, converted once the window exists
+def get_sprites():
+    if not _sprites:
+        get_window()
+        pipe = load_image("pipe.png").convert_alpha()
+        _sprites["bg"]          = pygame.transform.scale(pygame.image.load(os.path.join(ASSET_DIR, "bg.png")).convert_alpha(), (600, 900))
+        _sprites["pipe_top"]    = pygame.transform.flip(pipe, False, True)
+        _sprites["pipe_bottom"] = pipe
+        _sprites["base"]        = load_image("base.png").convert_alpha()
+        _sprites["birds"]       = bird_images()
+    return _sprites
+
+
+# recycles objects instead of allocating new ones: release() keeps an object that is no
+# longer used and acquire(*args) resets one of them with reset(*args), or makes a new one
+class Pool:
+    def __init__(self, cls, max_size=64):
+        self.cls = cls
+        self.max_size = max_size
+        self.free = []
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args)
+            return obj
+        return self.cls(*args)
+
+    def release(self, obj):
+        if len(self.free) < self.max_size:
+            self.free.append(obj)
 
 
 class Bird:
-    IMGS = bird_img
     MAX_ROTATION = 25           # how much the bird is gonna tilt (UP / DOWN)
     ROT_VEL = 20                # how much the bird gonna rotate on each frame
     ANIMATION_TIME = 5          # how long we gonna show each bird animation
+    __slots__ = ("x", "y", "tilt", "tick_count", "vel", "img_count", "frame", "height")
 
     def __init__(self, x, y):
+        self.reset(x, y)
+
+    # put the bird back at the start, e.g. to play again with the same object
+    def reset(self, x, y):
         self.x = x              # Starting X position
         self.y = y              # Starting Y position
         self.tilt = 0           # degrees to tilt
         self.tick_count = 0     # track the bird last jump
         self.vel = 0
         self.img_count = 0
-        self.img = self.IMGS[0]
+        self.frame = 0          # index of the current animation frame
         self.height = self.y
 
     # make the bird jump, velocity < 0 to jump up
@@ -73,35 +265,40 @@ class Bird:
 
         # for animation of bird, loop through three images
         if self.img_count <= self.ANIMATION_TIME:
-            self.img = self.IMGS[0]
+            self.frame = 0
         elif self.img_count <= self.ANIMATION_TIME * 2:
-            self.img = self.IMGS[1]
+            self.frame = 1
         elif self.img_count <= self.ANIMATION_TIME * 3:
-            self.img = self.IMGS[2]
+            self.frame = 2
         elif self.img_count <= self.ANIMATION_TIME * 4:
-            self.img = self.IMGS[1]
+            self.frame = 1
         elif self.img_count == self.ANIMATION_TIME * 4 + 1:
-            self.img = self.IMGS[0]
+            self.frame = 0
             self.img_count = 0
 
         # When bird is nose diving it isn't flapping
         if self.tilt <= -80:
-            self.img = self.IMGS[1]
+            self.frame = 1
             self.img_count = self.ANIMATION_TIME * 2
 
         # tilt the bird
-        blitRotateCenter(win, self.img, (self.x, self.y), self.tilt)
+        draw_bird(win, self.frame, self.x, self.y, self.tilt)
 
     # collision for the current image of the bird
     def get_mask(self):
-        return pygame.mask.from_surface(self.img)
+        return bird_mask(self.frame)
 
 
-# move object backward toward the bird
+# move object backward toward the bird, the sprites and masks are shared by every pipe
 class Pipe():
     VEL = 5
+    __slots__ = ("x", "gap", "height", "top", "bottom", "passed")
 
-    def __init__(self, x, gap):
+    def __init__(self, x, gap, height=None):
+        self.reset(x, gap, height)
+
+    # make the pipe new again, so released pipes can be reused from PIPES
+    def reset(self, x, gap, height=None):
         self.x = x
         self.gap = gap
         self.height = 0
@@ -110,17 +307,14 @@ class Pipe():
         self.top = 0
         self.bottom = 0
 
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
-        self.PIPE_BOTTOM = pipe_img
-
         # if the bird is already pass
         self.passed = False
-        self.set_height()
+        self.set_height(height)
 
-    # set the height of the pipe, from the top of the screen
-    def set_height(self):
-        self.height = random.randrange(50, 450)
-        self.top    = self.height - self.PIPE_TOP.get_height()
+    # set the height of the pipe, from the top of the screen (random when not given)
+    def set_height(self, height=None):
+        self.height = random.randrange(50, 450) if height is None else height
+        self.top    = self.height - PIPE_HEIGHT
         self.bottom = self.height + self.gap
 
     # move pipe based on velocity of the pipe
@@ -129,23 +323,30 @@ class Pipe():
 
     # draw both the top and bottom of the pipe
     def draw(self, win: pygame.Surface):
-        win.blit(self.PIPE_TOP, (self.x, self.top))
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
+        sprites = get_sprites()
+        win.blit(sprites["pipe_top"], (self.x, self.top))
+        win.blit(sprites["pipe_bottom"], (self.x, self.bottom))
 
-    # True if a point is colliding with the pipe
+    # True if the bird overlaps the pipe, pixel exact. Rectangles settle most cases: a bird
+    # that misses the bounding rect of a pipe misses it and one whose solid core overlaps
+    # the solid core of the pipe hits it, only the narrow band in between compares the masks
     def collide(self, bird: Bird):
-        bird_mask   = bird.get_mask()
-        top_mask    = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
-
-        top_offset    = (self.x - bird.x, self.top    - round(bird.y))
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
-
-        bottom_point = bird_mask.overlap(bottom_mask, bottom_offset)
-        top_point    = bird_mask.overlap(top_mask, top_offset)
-
-        if bottom_point or top_point:
-            return True
+        dx = self.x - bird.x
+        if not -PIPE_WIDTH < dx < BIRD_WIDTH:
+            return False
+
+        y = round(bird.y)
+        bird_bounds, bird_core = bird_boxes(bird.frame)
+        (top_bounds, top_core), (bottom_bounds, bottom_core) = pipe_boxes()
+
+        for bounds, core, part, dy in ((top_bounds, top_core, 0, self.top - y),
+                                       (bottom_bounds, bottom_core, 1, self.bottom - y)):
+            if not boxes_overlap(bird_bounds, bounds, dx, dy):
+                continue
+            if boxes_overlap(bird_core, core, dx, dy):
+                return True
+            if bird.get_mask().overlap(pipe_masks()[part], (dx, dy)):
+                return True
 
         return False
 
@@ -153,8 +354,8 @@ class Pipe():
 # move object backward toward the bird
 class Base:
     VEL = 5
-    IMG = base_img
-    WIDTH = base_img.get_width()
+    WIDTH = BASE_WIDTH
+    __slots__ = ("y", "x1", "x2")
 
     # Represnts the moving floor of the game
     def __init__(self, y):
@@ -175,21 +376,20 @@ class Base:
 
     # Draw the floor. This is two images that move together.
     def draw(self, win):
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
-
+        base_img = get_sprites()["base"]
+        win.blit(base_img, (self.x1, self.y))
+        win.blit(base_img, (self.x2, self.y))
 
-# Rotate a surface and blit it to the window
-def blitRotateCenter(surf, image, topleft, angle):
-    rotated_image = pygame.transform.rotate(image, angle)
-    new_rect = rotated_image.get_rect(center=image.get_rect(topleft=topleft).center)
 
-    surf.blit(rotated_image, new_rect.topleft)
+# pipes that left the screen, reused for the next ones
+PIPES = Pool(Pipe)
 
 
-# draws the windows for the main game loop
+# draws the windows for the main game loop, win is the Renderer of the window
 def draw_gameplay(win, bird, pipes, base, score, pause, gameStart, gameOver):
-    win.blit(BG_IMAGE, (0, 0))
+    STAT_FONT = get_font("stat")
+    END_FONT  = get_font("end")
+    win.begin()
 
     for pipe in pipes:
         pipe.draw(win)
@@ -198,44 +398,48 @@ def draw_gameplay(win, bird, pipes, base, score, pause, gameStart, gameOver):
 
     if not gameStart:
         bird.draw(win)
-        score_label = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
+        score_label = win.text(STAT_FONT, "Score: " + str(score), (255, 255, 255))
         win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
 
     if pause == True and gameStart == False and gameOver == False:
-        pause_label = END_FONT.render("PAUSED", 1, (255, 255, 255))
+        pause_label = win.text(END_FONT, "PAUSED", (255, 255, 255))
         win.blit(pause_label, (WIN_WIDTH  / 2 - pause_label.get_width() / 2, 
                                WIN_HEIGHT / 2 - pause_label.get_height()))
 
     if gameStart == True:
-        title_label = END_FONT.render("Flappy Bird", 1, (242, 242, 168))
+        title_label = win.text(END_FONT, "Flappy Bird", (242, 242, 168))
         win.blit(title_label, (WIN_WIDTH  / 2 - title_label.get_width() / 2, 
                                WIN_HEIGHT / 2 - title_label.get_height() - 100))
 
-        bird.x = WIN_WIDTH / 2 - bird_img[0].get_width() / 2
+        bird.x = WIN_WIDTH / 2 - BIRD_WIDTH / 2
         bird.y = 350
         bird.draw(win)
 
-        start_label = STAT_FONT.render("Press Any KEY to Play", 1, (255, 255, 255))
+        start_label = win.text(STAT_FONT, "Press Any KEY to Play", (255, 255, 255))
         win.blit(start_label, (WIN_WIDTH  / 2 - start_label.get_width() / 2, 
                                WIN_HEIGHT / 2 - start_label.get_height() + 100))
 
     if gameOver == True:
-        over_label = END_FONT.render("GAME OVER", 1, (192, 44, 44))
+        over_label = win.text(END_FONT, "GAME OVER", (192, 44, 44))
         win.blit(over_label, (WIN_WIDTH  / 2 - over_label.get_width() / 2, 
                               WIN_HEIGHT / 2 - over_label.get_height()))
 
-        retry_label = STAT_FONT.render("Press R to play again", 1, (255, 255, 255))
+        retry_label = win.text(STAT_FONT, "Press R to play again", (255, 255, 255))
         win.blit(retry_label, (WIN_WIDTH  / 2 - retry_label.get_width() / 2, 
                                WIN_HEIGHT / 2 - retry_label.get_height() + 100))
 
-    pygame.display.update()
+    win.present()
 
 
 if __name__ == '__main__':
+    get_window()
     clock = pygame.time.Clock()
-    bird  = Bird(230, 250)
-    base  = Base(FLOOR)
-    pipes = [Pipe(600, 200)]
+    timestep = FixedTimestep(TICK_RATE)
+    bird   = Bird(230, 250)
+    base   = Base(FLOOR)
+    course = Course(gap_range=(180, 300))
+    pipes  = [PIPES.acquire(600, *course.layout(0))]
+    placed = 1
 
     run       = True
     score     = 0
@@ -245,8 +449,10 @@ if __name__ == '__main__':
     gameOver  = False
 
     while run:
-        clock.tick(30)
+        clock.tick(FPS)
         for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                get_renderer().invalidate()
             if event.type == pygame.QUIT:
                 run = False
             if not gameStart:
@@ -265,64 +471,78 @@ if __name__ == '__main__':
                         score = 0
                         gameStart = False
                         gameOver  = False
-                        bird = Bird(230, 250)
-                        pipes = [Pipe(600, 200)]
+                        bird.reset(230, 250)
+                        course = Course(gap_range=(180, 300))
+                        for pipe in pipes:
+                            PIPES.release(pipe)
+                        pipes  = [PIPES.acquire(600, *course.layout(0))]
+                        placed = 1
             if gameStart == True:
                 if event.type in [pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN]:
                     score = 0
                     gameStart = False
                     gameOver  = False
-                    bird = Bird(230, 250)
-                    pipes = [Pipe(600, 200)]
-
-        if gameStart == True:
-            remove = []
-            for pipe in pipes:
-                if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                    remove.append(pipe)
-                pipe.move()
-            for pipe in remove:
-                pipes.remove(pipe)
-            add_pipe = False
-            if not pipe.passed and pipe.x < bird.x:
-                pipe.passed = True
-                add_pipe = True
-            if add_pipe:
-                pipes.append(Pipe(600, random.randint(180, 300)))
-            base.move()
-
-        elif not pause:
-            remove = []
-            add_pipe = False
-            for pipe in pipes:
-                if pipe.collide(bird):
-                    gameOver = True
-                if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                    remove.append(pipe)
+                    bird.reset(230, 250)
+                    course = Course(gap_range=(180, 300))
+                    for pipe in pipes:
+                        PIPES.release(pipe)
+                    pipes  = [PIPES.acquire(600, *course.layout(0))]
+                    placed = 1
+
+        # the world moves TICK_RATE times a second, however fast the frames are drawn
+        for _ in range(timestep.ticks()):
+            if gameStart == True:
+                remove = []
+                for pipe in pipes:
+                    if pipe.x + PIPE_WIDTH < 0:
+                        remove.append(pipe)
+                    pipe.move()
+                for pipe in remove:
+                    pipes.remove(pipe)
+                    PIPES.release(pipe)
+                add_pipe = False
                 if not pipe.passed and pipe.x < bird.x:
                     pipe.passed = True
                     add_pipe = True
-                pipe.move()
-            for pipe in remove:
-                pipes.remove(pipe)
-
-            # bird score pass through to the pipe
-            if add_pipe == True:
-                if not gameOver: score += 1
-                pipes.append(Pipe(600, random.randint(180, 300)))
-
-            # hit the ground, game over
-            if bird.y + bird.img.get_height() >= 730:
-                gameOver = True
+                if add_pipe:
+                    pipes.append(PIPES.acquire(600, *course.layout(placed)))
+                    placed += 1
+                base.move()
+
+            elif not pause:
+                remove = []
+                add_pipe = False
+                for pipe in pipes:
+                    if pipe.collide(bird):
+                        gameOver = True
+                    if pipe.x + PIPE_WIDTH < 0:
+                        remove.append(pipe)
+                    if not pipe.passed and pipe.x < bird.x:
+                        pipe.passed = True
+                        add_pipe = True
+                    pipe.move()
+                for pipe in remove:
+                    pipes.remove(pipe)
+                    PIPES.release(pipe)
+
+                # bird score pass through to the pipe
+                if add_pipe == True:
+                    if not gameOver: score += 1
+                    pipes.append(PIPES.acquire(600, *course.layout(placed)))
+                    placed += 1
+
+                # hit the ground, game over
+                if bird.y + BIRD_HEIGHT >= 730:
+                    gameOver = True
 
-            # highest score
-            if score > record:
-                record = score
+                # highest score
+                if score > record:
+                    record = score
 
-            bird.move()
-            base.move()
+                bird.move()
+                base.move()
 
-        draw_gameplay(WIN, bird, pipes, base, score, pause, gameStart, gameOver)
+        draw_gameplay(get_renderer(), bird, pipes, base, score, pause, gameStart, gameOver)
 
     pygame.quit()
     print("Your Highest Score is", record)
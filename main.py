@@ -1,103 +1,140 @@
 import os
-import neat
 import pygame
+import time
 import pickle
+import argparse
 
 from game import *
+from env import FlappyEnv
+from timestep import FixedTimestep
+from compiled_network import CompiledNetwork
+from profiler import FrameProfiler
+from replay import EpisodeRecorder
 
+PROFILE = False     # print the frame profile when the window is closed
+RECORD_PATH = None  # save the episode to this file when the window is closed
 
-# draws the windows for the main game loop
-def draw_AI_play(win, bird, pipes, base, score, gameOver):
-    win.blit(BG_IMAGE, (0, 0))
+
+# draws the windows for the main game loop, win is the Renderer of the window
+def draw_AI_play(win, birds, pipes, base, score, gameOver, speed=1):
+    STAT_FONT = get_font("stat")
+    END_FONT  = get_font("end")
+    win.begin()
     for pipe in pipes:
         pipe.draw(win)
 
     base.draw(win)
-    bird.draw(win)
-    score_label = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
+
+    # the crashed bird stays where it hit
+    if gameOver:
+        draw_bird(win, birds.frame[0], birds.x, birds.y[0], birds.tilt[0])
+    else:
+        birds.draw(win)
+    score_label = win.text(STAT_FONT, "Score: " + str(score), (255, 255, 255))
     win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
 
+    if speed != 1:
+        speed_label = win.text(STAT_FONT, f"Speed: {speed:g}x", (255, 255, 255))
+        win.blit(speed_label, (10, 10))
+
     if gameOver == True:
-        over_label = END_FONT.render("GAME OVER", 1, (192, 44, 44))
+        over_label = win.text(END_FONT, "GAME OVER", (192, 44, 44))
         win.blit(over_label, (WIN_WIDTH  / 2 - over_label.get_width()  / 2, 
                               WIN_HEIGHT / 2 - over_label.get_height() / 2))
 
-    pygame.display.update()
+    win.present()
 
 
-# Simulate best model for single birds
-def test_AI(net: neat.nn.FeedForwardNetwork):
-    score = 0
-    bird  = Bird(230, 350)
-    base  = Base(FLOOR)
-    pipes = [Pipe(700, 200)]
+# Simulate best model for single birds, a seed replays the same pipes and
+# speed fast-forwards the game, e.g. 100 plays 100 seconds of it every second
+def test_AI(net, seed=None, profiler=None, recorder=None, speed=1):
+    if profiler is None:
+        profiler = FrameProfiler()
+
+    env   = FlappyEnv(1, max_score=None, profiler=profiler)
+    obs   = env.reset(seed)
     clock = pygame.time.Clock()
+    win   = get_renderer()
+    timestep = FixedTimestep(TICK_RATE, speed)
 
     run = True
-    gameOver = False
+    start = time.perf_counter()
     while run:
-        clock.tick(30)
+        t = time.perf_counter()
+
+        clock.tick(FPS)
         for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                win.invalidate()
             if event.type == pygame.QUIT:
                 run = False
                 pygame.quit()
-                print("Your AI scores", score)
+                print("Your AI scores", env.score)
+                if PROFILE:
+                    print(profiler.format(time.perf_counter() - start))
+                if recorder is not None:
+                    recorder.save(RECORD_PATH)
+                    print("Episode saved to", RECORD_PATH)
                 quit()
+        t = profiler.lap("events", t)
 
-        # determine whether to use the first or second pipe on the screen for neural network input
-        pipe_idx = 0
-        if len(pipes) > 1 and bird.x > pipes[0].x + pipes[0].PIPE_TOP.get_width():
-            pipe_idx = 1                                         
-        bird.move()
-
-        # send bird location, top and bottom pipe location and determine from net (jump or not)
-        output = net.activate(
-                    (bird.y, abs(bird.y - pipes[pipe_idx].height), 
-                    abs(bird.y - pipes[pipe_idx].bottom))
-                )
-        if output[0] > 0.5:
-            bird.jump()
-
-        base.move()
-        remove = []
-        add_pipe = False
-        for pipe in pipes:
-            pipe.move()
-            if pipe.collide(bird):
-                gameOver = True
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                remove.append(pipe)
-            if not pipe.passed and pipe.x < bird.x:
-                pipe.passed = True
-                add_pipe = True
-        if add_pipe:
-            if not gameOver:
-                score += 1
-            pipes.append(Pipe(WIN_WIDTH, random.randint(180, 200)))
-        for pipe in remove:
-            pipes.remove(pipe)
-        if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:
-            gameOver = True
-
-        draw_AI_play(WIN, bird, pipes, base, score, gameOver)
+        # the world moves TICK_RATE times a second however fast the frames are drawn,
+        # it stops once the bird crashed and the window stays open
+        for _ in range(timestep.ticks()):
+            if env.done:
+                break
 
+            # send bird location, top and bottom pipe location and determine from net (jump or not)
+            output = net.activate(obs[0])
+            jump = output[0] > 0.5
+            profiler.lap("network", t)
 
-# runs the NEAT algorithm to train a neural network to play flappy bird
-def test_best_network(config_file):
-    with open("./model/best.pickle", "rb") as f:
-        winner = pickle.load(f)
+            obs, rewards, dones, info = env.step([jump])
+            t = time.perf_counter()
 
-    best_net = neat.nn.FeedForwardNetwork.create(winner, config_file)
-    test_AI(best_net)
+            if recorder is not None:
+                recorder.record(env.birds.y, env.birds.tilt, env.birds.alive, [jump], env.pipes, env.base, env.score)
+
+        draw_AI_play(win, env.birds, env.pipes, env.base, env.score, env.done, speed)
+        profiler.lap("render", t)
+
+
+# runs the NEAT algorithm to train a neural network to play flappy bird
+# the exported model (see export_model.py) is used as is, a pickled genome needs its neat config
+def test_best_network(model_path, config_path, seed=None, speed=1):
+    if model_path.endswith(".json"):
+        best_net = CompiledNetwork.load(model_path)
+    else:
+        import neat
+        with open(model_path, "rb") as f:
+            winner = pickle.load(f)
+        confg = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+        best_net = neat.nn.FeedForwardNetwork.create(winner, confg)
+
+    recorder = EpisodeRecorder(seed) if RECORD_PATH else None
+    test_AI(best_net, seed, recorder=recorder, speed=speed)
 
 
 # Path of current working directory
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Watch the trained network play Flappy Bird")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the pipes, random when not given")
+    parser.add_argument("--profile", action="store_true", help="print the time spent in each phase when closing")
+    parser.add_argument("--record", default=None, help="save the episode to this file when closing, see replay.py")
+    parser.add_argument("--speed", type=float, default=1, help="fast-forward the game, e.g. 10 or 100 times")
+    parser.add_argument("--model", default=None, help="exported .json model or pickled genome, model/best.json by default")
+    args = parser.parse_args()
+    PROFILE = args.profile
+    RECORD_PATH = args.record
+
     local_dir   = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
-
-    confg = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-            neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+    model_path  = args.model
+    if model_path is None:
+        model_path = os.path.join(local_dir, "model", "best.json")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(local_dir, "model", "best.pickle")
 
     # test model
-    test_best_network(confg)
\ No newline at end of file
+    test_best_network(model_path, config_path, args.seed, args.speed)
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+import neat
+
+FIELDS = ("time", "generation", "population", "species", "best_fitness", "mean_fitness", "stdev_fitness",
+          "eval_seconds", "elapsed", "frames", "bird_frames", "bird_frames_per_sec")
+
+
+# neat reporter that appends one row of metrics per generation to a .csv file, or a
+# .jsonl file (one json object per line) for any other extension. Rows are buffered and
+# written every flush_seconds and by close(), so a training doesn't wait on the disk.
+# The frames come from the profiler the training plays with, counted since start_generation
+class MetricsReporter(neat.reporting.BaseReporter):
+    def __init__(self, path, profiler, flush_seconds=10.0):
+        self.path = path
+        self.profiler = profiler
+        self.flush_seconds = flush_seconds
+        self.csv = path.endswith(".csv")
+        self.rows = []
+        self.last_flush = time.perf_counter()
+        self.created = time.perf_counter()
+        self.generation = None
+        self.start = None
+        self.frames = (0, 0)
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.start = time.perf_counter()
+        self.frames = (self.profiler.frames, self.profiler.bird_frames)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        now = time.perf_counter()
+        eval_seconds = now - self.start
+        fitness = np.array([genome.fitness for genome in population.values()], dtype=float)
+        frames = self.profiler.frames - self.frames[0]
+        bird_frames = self.profiler.bird_frames - self.frames[1]
+
+        self.rows.append({
+            "time": time.time(), "generation": self.generation, "population": len(fitness),
+            "species": len(species.species), "best_fitness": float(best_genome.fitness),
+            "mean_fitness": float(fitness.mean()), "stdev_fitness": float(fitness.std()),
+            "eval_seconds": eval_seconds, "elapsed": now - self.created,
+            "frames": frames, "bird_frames": bird_frames,
+            "bird_frames_per_sec": bird_frames / eval_seconds if eval_seconds > 0 else 0.0,
+        })
+        if now - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.perf_counter()
+        if not self.rows:
+            return
+
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as f:
+            if self.csv:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(self.rows)
+            else:
+                f.writelines(json.dumps(row) + "\n" for row in self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+
+# parse the complete rows of a metrics file from byte offset onwards, returns the rows and
+# the offset after the last complete line (a line still being written is read next time)
+def read_metrics(path, offset=0):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    lines = data[:end].decode().splitlines()
+
+    if not path.endswith(".csv"):
+        return [json.loads(line) for line in lines if line], offset + end
+    if offset == 0:
+        lines = lines[1:]       # the header
+    return [{field: float(value) for field, value in zip(FIELDS, row)} for row in csv.reader(lines)], offset + end
+
+
+# throughput and convergence of one training: the generations played, the best fitness and
+# when it was first reached, and when the best fitness first got to target (if given)
+def summarise(rows, target=None):
+    best = max(rows, key=lambda row: row["best_fitness"])
+    eval_seconds = sum(row["eval_seconds"] for row in rows)
+    summary = {
+        "generations": len(rows), "last_generation": int(rows[-1]["generation"]),
+        "best_fitness": best["best_fitness"], "best_generation": int(best["generation"]),
+        "final_mean_fitness": rows[-1]["mean_fitness"], "final_species": int(rows[-1]["species"]),
+        "eval_seconds": eval_seconds, "bird_frames": int(sum(row["bird_frames"] for row in rows)),
+        "bird_frames_per_sec": sum(row["bird_frames"] for row in rows) / eval_seconds if eval_seconds > 0 else 0.0,
+    }
+    if target is not None:
+        reached = [row for row in rows if row["best_fitness"] >= target]
+        summary["target_generation"] = int(reached[0]["generation"]) if reached else None
+        summary["target_elapsed"] = reached[0]["elapsed"] if reached else None
+    return summary
+
+
+def format_row(name, row):
+    return (f"{name}: gen {int(row['generation'])}, best {row['best_fitness']:.2f}, mean {row['mean_fitness']:.2f}, "
+            f"{int(row['species'])} species, {row['eval_seconds']:.2f} s, {row['bird_frames_per_sec']:,.0f} bird frames/sec")
+
+
+def format_summary(name, summary):
+    text = (f"{name}: {summary['generations']} generations (last {summary['last_generation']}), "
+            f"best {summary['best_fitness']:.2f} at gen {summary['best_generation']}, "
+            f"final mean {summary['final_mean_fitness']:.2f}, {summary['final_species']} species, "
+            f"{summary['eval_seconds']:.1f} s evaluating, {summary['bird_frames_per_sec']:,.0f} bird frames/sec")
+    if "target_generation" in summary:
+        reached = summary["target_generation"]
+        text += ", target not reached" if reached is None else \
+            f", target at gen {reached} ({summary['target_elapsed']:.1f} s)"
+    return text
+
+
+# print the rows of the files as they are appended, until interrupted
+def follow(paths, interval=1.0):
+    offsets = dict.fromkeys(paths, 0)
+    try:
+        while True:
+            for path in paths:
+                if os.path.exists(path):
+                    rows, offsets[path] = read_metrics(path, offsets[path])
+                    for row in rows:
+                        print(format_row(path, row), flush=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+# Path of current working directory
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Summarise or follow the metrics files written by train.py --metrics")
+    parser.add_argument("paths", nargs="+", help=".jsonl or .csv metrics files, one per training")
+    parser.add_argument("--follow", action="store_true", help="print the generations as they are written, like tail -f")
+    parser.add_argument("--target", type=float, default=None, help="also show when the best fitness first reached this")
+    parser.add_argument("--json", action="store_true", help="print the summaries as json")
+    args = parser.parse_args()
+
+    if args.follow:
+        follow(args.paths)
+    else:
+        summaries = {}
+        for path in args.paths:
+            rows, _ = read_metrics(path)
+            if rows:
+                summaries[path] = summarise(rows, args.target)
+        if args.json:
+            print(json.dumps(summaries, indent=2))
+        else:
+            for path, summary in summaries.items():
+                print(format_summary(path, summary))
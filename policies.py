@@ -0,0 +1,99 @@
+import numpy as np
+
+
+# decides when play() ends an episode, besides every bird being dead: stop(env, fitness)
+# is asked after every frame and finish(env) is told how the episode ended. Workers play
+# with a copy of the policy, which is merged back like the profiler. The default is the
+# original rule: stop once the score goes above 75
+class ScoreCap:
+    cacheable = True    # the fitness of a genome only depends on it and the course
+
+    def __init__(self, max_score=75):
+        self.max_score = max_score
+
+    def stop(self, env, fitness):
+        return env.score > self.max_score
+
+    def finish(self, env):
+        pass
+
+    def merge(self, other):
+        pass
+
+    def __str__(self):
+        return f"score above {self.max_score}"
+
+
+# also stop after a number of frames, however good the birds are
+class FrameCap(ScoreCap):
+    def __init__(self, max_frames, max_score=75):
+        super().__init__(max_score)
+        self.max_frames = max_frames
+
+    def stop(self, env, fitness):
+        return env.frames >= self.max_frames or super().stop(env, fitness)
+
+    def __str__(self):
+        return f"{self.max_frames} frames or {super().__str__()}"
+
+
+# stop once the order of the best genomes stopped changing: living birds all earn the
+# same reward, so when the top ones are alive (or out of reach of the living) the frames
+# left only add the same amount to each of them. Checked every check_every frames, the
+# ranking has to stay the same for patience checks in a row
+class StableRanking(ScoreCap):
+    cacheable = False   # when the episode ends depends on the other genomes
+
+    def __init__(self, top=10, check_every=50, patience=4, max_score=75):
+        super().__init__(max_score)
+        self.top = top
+        self.check_every = check_every
+        self.patience = patience
+        self.ranking = None
+        self.stable = 0
+
+    def stop(self, env, fitness):
+        if super().stop(env, fitness):
+            return True
+        if env.frames % self.check_every:
+            return False
+
+        ranking = np.argsort(-fitness, kind="stable")[:self.top]
+        if self.ranking is not None and np.array_equal(ranking, self.ranking):
+            self.stable += 1
+        else:
+            self.stable = 0
+        self.ranking = ranking
+        return self.stable >= self.patience
+
+    def finish(self, env):
+        self.ranking = None
+        self.stable = 0
+
+    def __str__(self):
+        return f"top {self.top} stable for {self.check_every * self.patience} frames or {super().__str__()}"
+
+
+# short episodes first: the score cap starts low and is multiplied by factor every
+# time a bird reaches it, until it gets to max_score
+class Curriculum(ScoreCap):
+    cacheable = False   # the cap only grows when a bird that reaches it is played
+
+    def __init__(self, start=10, factor=2, max_score=75):
+        super().__init__(max_score)
+        self.cap = min(start, max_score)
+        self.factor = factor
+
+    def stop(self, env, fitness):
+        return env.score > self.cap
+
+    def finish(self, env):
+        if env.score > self.cap:
+            self.cap = min(int(self.cap * self.factor), self.max_score)
+
+    # the cap reached by any worker
+    def merge(self, other):
+        self.cap = max(self.cap, other.cap)
+
+    def __str__(self):
+        return f"score above {self.cap} (curriculum up to {self.max_score})"
@@ -0,0 +1,171 @@
+import copy
+import numpy as np
+
+from game import *
+
+# collision lookup tables, one per (bird frame, "top" / "bottom" pipe)
+_tables = {}
+
+
+# copy a pygame mask into a boolean array indexed [row, column]
+def mask_array(mask):
+    width, height = mask.get_size()
+    return np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], dtype=bool)
+
+
+# precompute bird_mask.overlap(pipe_mask, (dx, dy)) for every offset where the two can touch,
+# the result is indexed [dx + pipe width - 1, dy + pipe height - 1]
+def overlap_table(bird, pipe):
+    bird_h, bird_w = bird.shape
+    pipe_h, pipe_w = pipe.shape
+    dys = np.arange(-pipe_h + 1, bird_h)
+    table = np.zeros((pipe_w + bird_w - 1, len(dys)), dtype=bool)
+
+    # for every bird row and every dy, the pipe row that lies on top of it
+    bird_rows = np.arange(bird_h)[:, None]
+    pipe_rows = bird_rows - dys[None, :]
+    inside = (pipe_rows >= 0) & (pipe_rows < pipe_h)
+    pipe_rows = np.clip(pipe_rows, 0, pipe_h - 1)
+
+    # a pipe is only made of a few distinct rows, so only those are overlapped with the bird
+    rows, row_idx = np.unique(pipe, axis=0, return_inverse=True)
+    row_idx = row_idx.ravel()
+    bird = bird.astype(np.int32)
+
+    for i, dx in enumerate(range(-pipe_w + 1, bird_w)):
+        shifted = np.zeros((len(rows), bird_w), dtype=np.int32)
+        lo, hi = max(0, dx), min(bird_w, dx + pipe_w)
+        shifted[:, lo:hi] = rows[:, lo - dx:hi - dx]
+        row_hit = ((bird @ shifted.T) > 0)[:, row_idx]
+        table[i] = (row_hit[bird_rows, pipe_rows] & inside).any(axis=0)
+
+    return table
+
+
+# lookup table for a bird frame against the top or bottom pipe, built on first use
+def collision_table(frame, part):
+    key = (frame, part)
+    if key not in _tables:
+        top_mask, bottom_mask = pipe_masks()
+        pipe_mask = top_mask if part == "top" else bottom_mask
+        _tables[key] = overlap_table(mask_array(bird_mask(frame)), mask_array(pipe_mask))
+    return _tables[key]
+
+
+# all the birds of a generation stored as arrays, stepped together every frame
+class BirdPopulation:
+    def __init__(self, size, x=230, y=350):
+        self.x = x                                      # every bird flies at the same x
+        self.start_y = y
+        self.y = np.full(size, y, dtype=float)
+        self.tilt = np.zeros(size)
+        self.tick_count = np.zeros(size)
+        self.vel = np.zeros(size)
+        self.height = self.y.copy()
+        self.img_count = np.zeros(size, dtype=int)
+        self.frame = np.zeros(size, dtype=int)
+        self.alive = np.ones(size, dtype=bool)
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    # make the selected birds jump, same as Bird.jump
+    def jump(self, mask):
+        mask = mask & self.alive
+        self.vel[mask] = -10.5
+        self.tick_count[mask] = 0
+        self.height[mask] = self.y[mask]
+
+    # move every living bird one frame, same as Bird.move
+    def move(self):
+        alive = self.alive
+        tick_count = self.tick_count[alive] + 1
+
+        # downward acceleration, terminal velocity and a stronger push when moving up
+        displacement = self.vel[alive] * tick_count + 1.5 * tick_count ** 2
+        displacement = np.where(displacement >= 16, 16, displacement)
+        displacement = np.where(displacement < 0, displacement - 2, displacement)
+
+        y = self.y[alive] + displacement
+        tilt = self.tilt[alive]
+        up = (displacement < 0) | (y < self.height[alive] + 50)
+        tilt = np.where(up, np.maximum(tilt, Bird.MAX_ROTATION),
+                        np.where(tilt > -90, tilt - Bird.ROT_VEL, tilt))
+
+        self.tick_count[alive] = tick_count
+        self.y[alive] = y
+        self.tilt[alive] = tilt
+
+    # living birds that overlap the pipe, pixel exact like Pipe.collide
+    def collide(self, pipe):
+        if not -PIPE_WIDTH < pipe.x - self.x < BIRD_WIDTH:
+            return np.zeros(len(self.alive), dtype=bool)
+        return self.collide_pipes(pipe.x, pipe.top, pipe.bottom)
+
+    # same as collide, but every bird has its own pipe given by arrays (or scalars)
+    # of the pipe x, top and bottom, e.g. birds that each fly in a different world
+    def collide_pipes(self, x, top, bottom):
+        hits = np.zeros(len(self.alive), dtype=bool)
+        dx = np.broadcast_to(np.asarray(x, dtype=int) - self.x, hits.shape)
+        idx = np.flatnonzero(self.alive & (dx > -PIPE_WIDTH) & (dx < BIRD_WIDTH))
+        if len(idx) == 0:
+            return hits
+
+        dx = dx[idx]
+        y = np.round(self.y[idx]).astype(int)
+        frames = self.frame[idx]
+        for part, pipe_y in (("top", top), ("bottom", bottom)):
+            dy = np.broadcast_to(pipe_y, hits.shape)[idx] - y + PIPE_HEIGHT - 1
+            inside = (dy >= 0) & (dy < PIPE_HEIGHT + BIRD_HEIGHT - 1)
+            for frame in np.unique(frames[inside]):
+                rows = inside & (frames == frame)
+                table = collision_table(int(frame), part)
+                hits[idx[rows]] |= table[dx[rows] + PIPE_WIDTH - 1, dy[rows]]
+
+        return hits
+
+    # living birds that hit the floor or flew too far above the screen
+    def out_of_bounds(self):
+        return self.alive & ((self.y + BIRD_HEIGHT - 10 >= FLOOR) | (self.y < -50))
+
+    # put the selected birds back at the start, alive
+    def reset(self, mask):
+        self.y[mask] = self.start_y
+        self.height[mask] = self.start_y
+        for array in (self.tilt, self.tick_count, self.vel, self.img_count, self.frame):
+            array[mask] = 0
+        self.alive[mask] = True
+
+    # remove birds from the game
+    def kill(self, mask):
+        self.alive &= ~mask
+
+    # copy of the positions for drawing on another thread, with its own animation state
+    def snapshot(self):
+        snapshot = copy.copy(self)
+        snapshot.y = self.y.copy()
+        snapshot.tilt = self.tilt.copy()
+        snapshot.alive = self.alive.copy()
+        snapshot.img_count = np.zeros_like(self.img_count)
+        snapshot.frame = np.zeros_like(self.frame)
+        return snapshot
+
+    # draw every living bird, animated the same way as Bird.draw
+    def draw(self, win):
+        idx = np.flatnonzero(self.alive)
+        count = self.img_count[idx] + 1
+        frame = np.select([count <= Bird.ANIMATION_TIME, count <= Bird.ANIMATION_TIME * 2,
+                           count <= Bird.ANIMATION_TIME * 3, count <= Bird.ANIMATION_TIME * 4],
+                          [0, 1, 2, 1], 0)
+        count[count == Bird.ANIMATION_TIME * 4 + 1] = 0
+
+        # nose diving birds aren't flapping
+        diving = self.tilt[idx] <= -80
+        frame[diving] = 1
+        count[diving] = Bird.ANIMATION_TIME * 2
+
+        self.img_count[idx] = count
+        self.frame[idx] = frame
+
+        for i in idx:
+            draw_bird(win, self.frame[i], self.x, self.y[i], self.tilt[i])
@@ -0,0 +1,47 @@
+import os
+import csv
+import json
+import time
+
+import neat
+
+
+# neat reporter that prints the profile of every generation and optionally
+# exports it to a .csv (one row per generation) or .json (list of rows) file
+class ProfileReporter(neat.reporting.BaseReporter):
+    def __init__(self, profiler, path=None):
+        self.profiler = profiler
+        self.path = path
+        self.rows = []
+        if path and path.endswith(".json") and os.path.exists(path):
+            with open(path) as f:
+                self.rows = json.load(f)
+        self.generation = None
+        self.start = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.profiler.reset()
+        self.start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        wall_time = time.perf_counter() - self.start
+        row = {"generation": self.generation}
+        row.update(self.profiler.summary(wall_time))
+        self.rows.append(row)
+
+        print(self.profiler.format(wall_time))
+        if self.path:
+            self.export(row)
+
+    def export(self, row):
+        if self.path.endswith(".json"):
+            with open(self.path, "w") as f:
+                json.dump(self.rows, f, indent=2)
+        else:
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(row)
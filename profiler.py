@@ -0,0 +1,47 @@
+import time
+
+PHASES = ("events", "physics", "network", "collision", "pipes", "render")
+
+
+# accumulates the time spent in each phase of the frame loop, the loop calls
+# lap(phase, start) at the end of every phase and frame(birds) once per frame
+class FrameProfiler:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.frames = 0
+        self.bird_frames = 0
+
+    # add the time since start to the phase and return the start of the next phase
+    def lap(self, phase, start):
+        now = time.perf_counter()
+        self.times[phase] += now - start
+        return now
+
+    def frame(self, birds):
+        self.frames += 1
+        self.bird_frames += birds
+
+    # add the counters of another profiler, e.g. from a worker process
+    def merge(self, other):
+        for phase, seconds in other.times.items():
+            self.times[phase] += seconds
+        self.frames += other.frames
+        self.bird_frames += other.bird_frames
+
+    # counters and rates over the given wall clock time, as one flat row
+    def summary(self, wall_time):
+        row = {"wall_time": wall_time, "frames": self.frames, "bird_frames": self.bird_frames,
+               "fps": self.frames / wall_time if wall_time > 0 else 0.0,
+               "bird_frames_per_sec": self.bird_frames / wall_time if wall_time > 0 else 0.0}
+        row.update({f"{phase}_time": self.times[phase] for phase in PHASES})
+        return row
+
+    def format(self, wall_time):
+        row = self.summary(wall_time)
+        phases = ", ".join(f"{phase} {1000 * self.times[phase]:.1f} ms" for phase in PHASES if self.times[phase])
+        return (f"Frames: {row['frames']} ({row['fps']:.0f} fps), "
+                f"bird frames: {row['bird_frames']} ({row['bird_frames_per_sec']:.0f}/sec)\n"
+                f"Phases: {phases}")
@@ -0,0 +1,160 @@
+import time
+import threading
+
+import pygame
+
+
+# draws a frame on the window the cheap way: it only restores the background and
+# updates the screen where something was drawn this frame or the last one,
+# batches consecutive blits into one Surface.blits call and caches rendered text.
+# It has the blit / blits methods of a Surface, so the draw(win) methods accept it.
+# update(rects) shows the changed parts, update() all of it: pygame.display.update
+# for the window, something else when drawing on an offscreen surface
+class Renderer:
+    MAX_TEXTS = 256     # rendered labels kept before the cache is cleared
+    MAX_RECTS = 64      # above this many dirty rects, update their union instead
+
+    def __init__(self, win, background, update=pygame.display.update):
+        self.win = win
+        self.background = background
+        self.update = update
+        self.texts = {}
+        self.pending = []       # queued (surface, position) blits
+        self.drawn = []         # rects drawn this frame
+        self.previous = None    # rects drawn last frame, None to redraw everything
+
+    # start a frame by putting the background back where the last frame drew
+    def begin(self):
+        if self.previous is None:
+            self.win.blit(self.background, (0, 0))
+        else:
+            self.win.blits([(self.background, rect, rect) for rect in self.previous], 0)
+        self.drawn = []
+
+    def blit(self, source, dest):
+        self.pending.append((source, dest))
+
+    def blits(self, blit_sequence):
+        self.pending.extend(blit_sequence)
+
+    # draw the queued blits in one call
+    def flush(self):
+        if self.pending:
+            self.drawn.extend(self.win.blits(self.pending))
+            self.pending = []
+
+    def line(self, color, start, end, width=1):
+        self.flush()
+        self.drawn.append(pygame.draw.line(self.win, color, start, end, width))
+
+    # the rendered text, only rendered again when the text changes
+    def text(self, font, text, color):
+        key = (font, text, color)
+        if key not in self.texts:
+            if len(self.texts) >= self.MAX_TEXTS:
+                self.texts.clear()
+            self.texts[key] = font.render(text, 1, color)
+        return self.texts[key]
+
+    # show the frame, updating only the parts of the screen that changed
+    def present(self):
+        self.flush()
+        if self.previous is None:
+            self.update()
+        else:
+            rects = self.previous + self.drawn
+            if len(rects) > self.MAX_RECTS:
+                rects = [rects[0].unionall(rects[1:])]
+            self.update(rects)
+        self.previous = self.drawn
+
+    # draw everything again on the next frame, e.g. after the window was covered
+    def invalidate(self):
+        self.previous = None
+
+
+# draws snapshots of a world on its own thread at most fps times a second, so the
+# simulation never waits for rendering: it asks wants_frame() before building a
+# snapshot and frames that come while the last one is still being drawn are skipped.
+# SDL only allows window and event calls from the main thread, so the thread draws on
+# an offscreen copy of the window and the simulation thread shows the finished frame
+# and pumps the events in poll(). There is one frame in flight at a time, the canvas
+# is never drawn on while it is being shown
+class RenderThread(threading.Thread):
+    def __init__(self, renderer, draw, fps=30):
+        super().__init__(daemon=True)
+        self.renderer = renderer    # the window
+        self.canvas = Renderer(renderer.win.copy(), renderer.background, self.finish)
+        self.draw = draw            # draw(canvas, snapshot) draws and presents one frame
+        self.interval = 1 / fps
+        self.snapshot = None
+        self.finished = None        # the rects of the drawn frame to show, [] for all of it
+        self.repaint = False
+        self.next_frame = 0.0
+        self.next_poll = 0.0
+        self.wake = threading.Event()
+        self.running = True
+        self.rendered = 0
+        self.skipped = 0
+
+    # True when the thread is idle and the next frame is due
+    def wants_frame(self):
+        if self.snapshot is None and time.perf_counter() >= self.next_frame:
+            return True
+        self.skipped += 1
+        return False
+
+    def submit(self, snapshot):
+        self.snapshot = snapshot
+        self.wake.set()
+
+    def run(self):
+        while self.running:
+            self.wake.wait()
+            self.wake.clear()
+            if self.snapshot is None:
+                continue
+
+            self.next_frame = time.perf_counter() + self.interval
+            self.draw(self.canvas, self.snapshot)
+            self.rendered += 1
+
+    # called by the canvas when a frame is drawn, the simulation thread shows it
+    def finish(self, rects=None):
+        self.finished = [] if rects is None else list(rects)
+
+    # copy the drawn frame to the window, then the next snapshot can be drawn
+    def show(self):
+        rects = self.finished
+        if self.repaint or not rects:
+            self.renderer.win.blit(self.canvas.win, (0, 0))
+            pygame.display.update()
+            self.repaint = False
+        else:
+            self.renderer.win.blits([(self.canvas.win, rect, rect) for rect in rects], 0)
+            pygame.display.update(rects)
+        self.finished = None
+        self.snapshot = None
+
+    # show the last drawn frame and pump the window events at the display rate,
+    # False once the window was closed. Called by the simulation thread
+    def poll(self):
+        if self.finished is not None:
+            self.show()
+
+        now = time.perf_counter()
+        if now < self.next_poll:
+            return True
+        self.next_poll = now + self.interval
+
+        for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                self.repaint = True
+            if event.type == pygame.QUIT:
+                return False
+        return True
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.join()
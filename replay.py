@@ -0,0 +1,161 @@
+import os
+import argparse
+
+import numpy as np
+import pygame
+
+from game import *
+from population import BirdPopulation
+
+MAX_PIPES = 4       # pipes on screen at once, they are spaced far wider than the window / 4
+
+
+# records every frame of an episode: the birds' y, tilt, alive and jump flags, the pipes
+# and the floor, so it can be replayed later without the networks that played it
+class EpisodeRecorder:
+    def __init__(self, seed=None, x=230):
+        self.seed = -1 if seed is None else seed
+        self.x = x
+        self.frames = {key: [] for key in ("y", "tilt", "alive", "jump", "pipes", "pipe_count", "base", "score")}
+
+    def record(self, y, tilt, alive, jump, pipes, base, score):
+        if len(pipes) > MAX_PIPES:
+            raise ValueError(f"Can't record more than {MAX_PIPES} pipes on screen")
+
+        layout = np.zeros((MAX_PIPES, 3), dtype=np.int16)
+        layout[:len(pipes)] = [(pipe.x, pipe.height, pipe.bottom) for pipe in pipes]
+
+        self.frames["y"].append(np.array(y, dtype=np.float32))
+        self.frames["tilt"].append(np.array(tilt, dtype=np.int16))
+        self.frames["alive"].append(np.array(alive, dtype=bool))
+        self.frames["jump"].append(np.array(jump, dtype=bool))
+        self.frames["pipes"].append(layout)
+        self.frames["pipe_count"].append(len(pipes))
+        self.frames["base"].append((base.x1, base.x2))
+        self.frames["score"].append(score)
+
+    def __len__(self):
+        return len(self.frames["y"])
+
+    # write the episode as compressed numpy arrays, extra arrays (e.g. fitness) are stored along
+    def save(self, path, **extra):
+        arrays = {key: np.array(values) for key, values in self.frames.items()}
+        arrays["base"] = arrays["base"].astype(np.int16)
+        arrays["pipe_count"] = arrays["pipe_count"].astype(np.uint8)
+        arrays["score"] = arrays["score"].astype(np.int32)
+        np.savez_compressed(path, seed=self.seed, x=self.x, **arrays, **extra)
+
+
+# a recorded episode, arrays are indexed [frame] or [frame, bird]
+class Episode:
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.arrays = {key: data[key] for key in data.files}
+        for key, value in self.arrays.items():
+            setattr(self, key, value)
+
+    def __len__(self):
+        return len(self.y)
+
+    # the pipes on screen at a frame, as Pipe objects for drawing taken from PIPES
+    def pipes_at(self, frame):
+        return [PIPES.acquire(int(x), int(bottom - height), int(height))
+                for x, height, bottom in self.pipes[frame][:self.pipe_count[frame]]]
+
+    def base_at(self, frame):
+        base = Base(FLOOR)
+        base.x1, base.x2 = (int(x) for x in self.base[frame])
+        return base
+
+
+# draws a recorded frame, birds is a BirdPopulation used to keep the animation going
+def draw_episode_frame(win, episode, frame, birds, only=None):
+    birds.y[:] = episode.y[frame]
+    birds.tilt[:] = episode.tilt[frame]
+    birds.alive[:] = episode.alive[frame]
+    if only is not None:
+        birds.alive &= np.arange(len(birds.alive)) == only
+
+    win.begin()
+    for pipe in episode.pipes_at(frame):
+        pipe.draw(win)
+        PIPES.release(pipe)
+    episode.base_at(frame).draw(win)
+    birds.draw(win)
+
+    STAT_FONT = get_font("stat")
+    score_label = win.text(STAT_FONT, "Score: " + str(episode.score[frame]), (255, 255, 255))
+    win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
+    frame_label = win.text(STAT_FONT, f"Frame: {frame + 1}/{len(episode)}", (255, 255, 255))
+    win.blit(frame_label, (10, 10))
+    win.present()
+
+
+# plays the episode in the window: LEFT / RIGHT step (paused) or seek, SPACE pauses,
+# UP / DOWN change the speed, which may be fractional
+def replay(episode, speed=1.0, start=0, only=None):
+    win   = get_renderer()
+    clock = pygame.time.Clock()
+    birds = BirdPopulation(episode.y.shape[1], int(episode.x))
+
+    position = float(start)
+    paused = False
+    while True:
+        clock.tick(30)
+        for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                win.invalidate()
+            if event.type == pygame.QUIT:
+                return
+            if event.type == pygame.KEYDOWN:
+                if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                    return
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                if event.key == pygame.K_UP:
+                    speed *= 2
+                if event.key == pygame.K_DOWN:
+                    speed /= 2
+                if event.key == pygame.K_RIGHT:
+                    position += 1 if paused else 30 * speed
+                if event.key == pygame.K_LEFT:
+                    position -= 1 if paused else 30 * speed
+
+        position = min(max(position, 0), len(episode) - 1)
+        draw_episode_frame(win, episode, int(position), birds, only)
+        if not paused:
+            position += speed
+
+
+# save every step-th frame of the episode as a png, without showing a window
+def export_frames(episode, directory, step=1, only=None):
+    os.makedirs(directory, exist_ok=True)
+    win   = get_renderer()
+    birds = BirdPopulation(episode.y.shape[1], int(episode.x))
+    for frame in range(0, len(episode), step):
+        draw_episode_frame(win, episode, frame, birds, only)
+        pygame.image.save(get_window(), os.path.join(directory, f"frame-{frame:06d}.png"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a recorded episode")
+    parser.add_argument("episode", help="episode file written by train.py --record or main.py --record")
+    parser.add_argument("--speed", type=float, default=1.0, help="recorded frames per displayed frame")
+    parser.add_argument("--start", type=int, default=0, help="frame to start from")
+    parser.add_argument("--bird", type=int, default=None, help="only show this bird")
+    parser.add_argument("--best", action="store_true", help="only show the bird with the best fitness")
+    parser.add_argument("--export", default=None, help="save the frames as png files in this directory")
+    parser.add_argument("--step", type=int, default=1, help="export every n-th frame")
+    args = parser.parse_args()
+
+    episode = Episode(args.episode)
+    only = args.bird
+    if args.best and "fitness" in episode.arrays:
+        only = int(np.argmax(episode.fitness))
+
+    if args.export:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        export_frames(episode, args.export, args.step, only)
+    else:
+        replay(episode, args.speed, args.start, only)
+    pygame.quit()
@@ -0,0 +1,68 @@
+import os
+import random
+import tempfile
+
+import neat
+
+from checkpoint import AtomicCheckpointer
+from export_model import load_config
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config-feedforward.txt")
+
+
+# a fitness that only depends on the genome, so runs can be compared without playing
+def eval_genomes(genomes, config):
+    for genome_id, genome in genomes:
+        genome.fitness = sum(cg.weight for cg in genome.connections.values()) + len(genome.nodes)
+
+
+def new_population(seed=0):
+    config = load_config(CONFIG_PATH)
+    config.fitness_threshold = float("inf")
+    random.seed(seed)
+    return neat.Population(config)
+
+
+# run for generations, saving a checkpoint every generation like train_neat_AI
+def run(P, generations, directory):
+    checkpointer = AtomicCheckpointer(1, None, directory)
+    checkpointer.best_genome = P.best_genome
+    checkpointer.last_generation_checkpoint = P.generation - 1
+    checkpointer.reproduction = P.reproduction
+    P.add_reporter(checkpointer)
+    P.run(eval_genomes, generations)
+    return P
+
+
+def test_resume_hands_out_new_keys():
+    with tempfile.TemporaryDirectory() as directory:
+        run(new_population(), 4, directory)
+        P = AtomicCheckpointer.restore_checkpoint(os.path.join(directory, "neat-checkpoint-4"))
+
+        restored = set(P.population) | set(P.reproduction.ancestors)
+        for species in P.species.species.values():
+            restored |= set(species.members)
+        run(P, 1, directory)
+
+        new = set(P.population) - restored
+        assert new, "the resumed generation made no children"
+        assert min(new) > max(restored)
+
+
+def test_resume_matches_uninterrupted_run():
+    with tempfile.TemporaryDirectory() as directory:
+        whole = run(new_population(), 6, directory)
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(new_population(), 3, directory)
+        resumed = run(AtomicCheckpointer.restore_checkpoint(os.path.join(directory, "neat-checkpoint-3")), 3, directory)
+
+    assert sorted(whole.population) == sorted(resumed.population)
+    assert whole.best_genome.key == resumed.best_genome.key
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(name, "ok")
@@ -0,0 +1,92 @@
+import random
+
+import numpy as np
+
+from game import *
+from population import BirdPopulation
+
+# every bird x and (whole pixel) bird y around a pipe whose top part ends at y 300 and
+# whose bottom part starts at y 500, from just out of reach on every side
+PIPE_X = 230
+DXS = range(-PIPE_WIDTH - 2, BIRD_WIDTH + 3)
+YS = range(-60, 761)
+
+
+# the original pixel exact check: the bird's mask against both pipe masks
+def mask_collide(pipe, frame, y):
+    top, bottom = pipe_masks()
+    bird = bird_mask(frame)
+    y = round(y)
+    return bool(bird.overlap(top, (pipe.x - PIPE_X, pipe.top - y)) or
+                bird.overlap(bottom, (pipe.x - PIPE_X, pipe.bottom - y)))
+
+
+def grid():
+    for frame in range(3):
+        for dx in DXS:
+            for y in YS:
+                yield frame, PIPE_X + dx, y
+
+
+# a few bird heights between whole pixels, for the rounding
+def fractional(n=20000, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(3), PIPE_X + rng.choice(DXS), rng.uniform(YS[0], YS[-1])) for _ in range(n)]
+
+
+def check_pipe_collide(cases):
+    pipe = Pipe(PIPE_X, 200, 300)
+    bird = Bird(PIPE_X, 0)
+    mismatches = []
+    for frame, pipe_x, y in cases:
+        pipe.x, bird.frame, bird.y = pipe_x, frame, y
+        if pipe.collide(bird) != mask_collide(pipe, frame, y):
+            mismatches.append((frame, pipe_x, y))
+    assert not mismatches, mismatches[:10]
+
+
+def check_collide_pipes(cases):
+    frames, pipe_x, ys = (np.array(column) for column in zip(*cases))
+    pipe = Pipe(PIPE_X, 200, 300)
+    birds = BirdPopulation(len(ys), PIPE_X)
+    birds.y[:], birds.frame[:] = ys, frames
+    hits = birds.collide_pipes(pipe_x, pipe.top, pipe.bottom)
+
+    expected = []
+    for frame, x, y in cases:
+        pipe.x = x
+        expected.append(mask_collide(pipe, frame, y))
+    mismatches = np.flatnonzero(hits != np.array(expected))
+    assert len(mismatches) == 0, [cases[i] for i in mismatches[:10]]
+
+
+def test_pipe_collide_matches_masks():
+    check_pipe_collide(grid())
+
+
+def test_pipe_collide_rounds_like_masks():
+    check_pipe_collide(fractional())
+
+
+def test_collide_pipes_matches_masks():
+    check_collide_pipes(list(grid()))
+
+
+def test_collide_pipes_rounds_like_masks():
+    check_collide_pipes(fractional())
+
+
+# the dead birds never hit anything
+def test_collide_pipes_skips_dead_birds():
+    pipe = Pipe(PIPE_X, 200, 300)
+    birds = BirdPopulation(2, PIPE_X, 280)
+    assert birds.collide_pipes(PIPE_X, pipe.top, pipe.bottom).all()
+    birds.kill(np.array([True, False]))
+    assert birds.collide_pipes(PIPE_X, pipe.top, pipe.bottom).tolist() == [False, True]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(name, "ok")
@@ -0,0 +1,25 @@
+import time
+
+
+# runs a simulation at a fixed number of ticks per second of wall clock (times speed),
+# whatever the frame rate: every frame ticks() adds the time since the last frame and
+# returns how many ticks fit in it, the remainder carries over to the next frame.
+# After a long hitch at most max_lag seconds are caught up, so a slow frame can't
+# make the next one slower still
+class FixedTimestep:
+    def __init__(self, tick_rate=30, speed=1.0, max_lag=0.25):
+        self.tick_rate = tick_rate
+        self.speed = speed
+        self.max_lag = max_lag
+        self.accumulator = 0.0
+        self.last = None
+
+    def ticks(self):
+        now = time.perf_counter()
+        elapsed = 0.0 if self.last is None else min(now - self.last, self.max_lag)
+        self.last = now
+
+        self.accumulator += elapsed * self.speed * self.tick_rate
+        ticks = int(self.accumulator)
+        self.accumulator -= ticks
+        return ticks
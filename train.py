@@ -1,176 +1,334 @@
 import os
+import copy
 import neat
 import pygame
+import time
 import pickle
+import argparse
+import multiprocessing
+import numpy as np
 
 from game import *
+from env import FlappyEnv
+from batch_network import BatchNetwork
+from checkpoint import AtomicCheckpointer
+from fitness_cache import FitnessCache
+from export_model import compile_genome
+from profiler import FrameProfiler
+from profile_reporter import ProfileReporter
+from metrics import MetricsReporter
+from policies import ScoreCap, FrameCap, StableRanking, Curriculum
+from renderer import RenderThread
+from replay import EpisodeRecorder
 
 DRAW_LINES = True
+HEADLESS = True     # no window, no clock cap and no drawing, --window shows the visualiser
+SEED = None         # pipes of generation n are seeded with SEED + n, random when None
+SAME_COURSE = False # every generation plays the pipes of SEED
+GENERATIONS = 20
 GEN = 0
+PROFILER = FrameProfiler()
+POLICY = ScoreCap() # when an episode ends, besides every bird being dead
+VIEWER = None       # RenderThread drawing snapshots of the training, if any
+RECORD_DIR = None   # directory where the episode of every generation is saved
+CACHE = FitnessCache()  # fitness of genomes already played on a course, None to always play
 
 # draw lines from bird to pipe
-def draw_lines(win, pipe_idx):
-    try:
-        pygame.draw.line(
-            win, (255, 0, 0), (bird.x + bird.img.get_width() / 2, bird.y + bird.img.get_height() / 2),
-            (pipes[pipe_idx].x + pipes[pipe_idx].PIPE_TOP.get_width() / 2, pipes[pipe_idx].height), 5
-        )
-        pygame.draw.line(
-            win, (255, 0, 0), (bird.x + bird.img.get_width() / 2, bird.y + bird.img.get_height() / 2),
-            (pipes[pipe_idx].x + pipes[pipe_idx].PIPE_BOTTOM.get_width() / 2, pipes[pipe_idx].bottom), 5
-        )
-    except BaseException:
-        pass
-
-
-# draws the windows for the main game loop
+def draw_lines(win, x, y, pipe):
+    win.line(
+        (255, 0, 0), (x + BIRD_WIDTH / 2, y + BIRD_HEIGHT / 2),
+        (pipe.x + PIPE_WIDTH / 2, pipe.height), 5
+    )
+    win.line(
+        (255, 0, 0), (x + BIRD_WIDTH / 2, y + BIRD_HEIGHT / 2),
+        (pipe.x + PIPE_WIDTH / 2, pipe.bottom), 5
+    )
+
+
+# draws the windows for the main game loop, win is the Renderer of the window
 def draw_window(win, birds, pipes, base, score, gen, pipe_idx):
     if gen == 0: gen = 1
-    win.blit(BG_IMAGE, (0, 0))
+    STAT_FONT = get_font("stat")
+    win.begin()
 
     for pipe in pipes:
         pipe.draw(win)
 
     base.draw(win)
-    for bird in birds:
-        if DRAW_LINES:
-            draw_lines(win, pipe_idx)
+    if DRAW_LINES and pipe_idx < len(pipes):
+        for y in birds.y[birds.alive]:
+            draw_lines(win, birds.x, y, pipes[pipe_idx])
 
-        # draw bird
-        bird.draw(win)
+    # draw birds
+    birds.draw(win)
 
     # score
-    score_label = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
+    score_label = win.text(STAT_FONT, "Score: " + str(score), (255, 255, 255))
     win.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
 
     # generations
-    score_label = STAT_FONT.render("Gens: " + str(gen - 1), 1, (255, 255, 255))
+    score_label = win.text(STAT_FONT, "Gens: " + str(gen - 1), (255, 255, 255))
     win.blit(score_label, (10, 10))
 
     # alive
-    score_label = STAT_FONT.render("Alive: " + str(len(birds)), 1, (255, 255, 255))
+    score_label = win.text(STAT_FONT, "Alive: " + str(len(birds)), (255, 255, 255))
     win.blit(score_label, (10, 70))
 
-    pygame.display.update()
+    win.present()
 
 
-# runs the simulation of the current population of birds and 
-# sets their fitness based on the distance they reach in the game
-def eval_genomes(genomes, config):
-    global GEN
-    GEN += 1
+# plays one world with the given genomes and returns their fitness, based on the
+# distance they reach in the game. A seed makes the pipes the same on every call,
+# the policy decides when the episode ends (see policies.py)
+def play(GE, config, seed=None, draw=False, profiler=None, viewer=None, recorder=None, policy=None):
+    if profiler is None:
+        profiler = FrameProfiler()
+    if policy is None:
+        policy = ScoreCap()
 
-    # creating lists of genome, the neural network associated with the genome 
-    # and the bird object that uses that network to play
-    GE    = []
-    nets  = []
-    birds = []
+    # the neural networks of the genomes compiled into one batch and
+    # the birds that use those networks to play, all indexed like GE
+    nets    = BatchNetwork.create(GE, config)
+    env     = FlappyEnv(len(GE), max_score=None, profiler=profiler)
+    fitness = np.zeros(len(GE))
+    obs     = env.reset(seed)
 
-    # start with fitness level of 0
-    for genome_id, genome in genomes:
-        genome.fitness = 0
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-        nets.append(net)
-        birds.append(Bird(230, 350))
-        GE.append(genome)
+    clock = pygame.time.Clock()
+    if draw:
+        win = get_renderer()
+
+    while not env.done:
+        t = time.perf_counter()
+
+        # the visualiser is capped to 30 fps, headless runs as fast as possible
+        if draw:
+            clock.tick(30)
+
+            for event in pygame.event.get():
+                if event.type == pygame.VIDEOEXPOSE:
+                    win.invalidate()
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    quit()
+            t = profiler.lap("events", t)
+
+        # with a render thread the simulation runs uncapped and only pumps events
+        elif viewer is not None:
+            if not viewer.poll():
+                viewer.stop()
+                pygame.quit()
+                quit()
+            t = profiler.lap("events", t)
 
-    score = 0
-    base = Base(FLOOR)
-    pipes = [Pipe(700, 200)]
+        # send bird location, top and bottom pipe location and determine from net (jump or not)
+        alive = env.birds.alive
+        output = nets.activate(obs[alive], alive)
 
-    clock = pygame.time.Clock()
+        # tanh activation function, result will be between -1 and 1
+        jumps = np.zeros(len(GE), dtype=bool)
+        jumps[alive] = output[:, 0] > 0.5
+        profiler.lap("network", t)
 
-    run = True
-    while run and len(birds) > 0:
-        clock.tick(30)
+        # a fitness of 0.1 for each frame alive, -1 for hitting a pipe and 5 for passing one
+        obs, rewards, dones, info = env.step(jumps)
+        fitness += rewards
+        t = time.perf_counter()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()
+        if recorder is not None:
+            recorder.record(env.birds.y, env.birds.tilt, env.birds.alive, jumps, env.pipes, env.base, env.score)
+
+        if draw:
+            draw_window(win, env.birds, env.pipes, env.base, env.score, GEN, env.pipe_idx)
+            profiler.lap("render", t)
+
+        # the render thread only gets the frames it has time to draw, the others are skipped
+        elif viewer is not None and viewer.wants_frame():
+            viewer.submit((env.birds.snapshot(), [copy.copy(pipe) for pipe in env.pipes],
+                           copy.copy(env.base), env.score, GEN, env.pipe_idx))
+            profiler.lap("render", t)
 
-        # determine whether to use the first or second pipe on the screen for neural network input
-        pipe_idx = 0
-        if len(birds) > 0:
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width():
-                pipe_idx = 1                                              
-
-        # give each bird a fitness of 0.1 for each frame it stays alive
-        bird: Bird
-        for x, bird in enumerate(birds):
-            GE[x].fitness += 0.1
-            bird.move()
-
-            # send bird location, top and bottom pipe location and determine from net (jump or not)
-            output = nets[birds.index(bird)].activate(
-                        (bird.y, abs(bird.y - pipes[pipe_idx].height), 
-                        abs(bird.y - pipes[pipe_idx].bottom))
-                    )
-
-            # tanh activation function, result will be between -1 and 1
-            if output[0] > 0.5:
-                bird.jump()
-
-        base.move()
-
-        remove = []
-        add_pipe = False
-        for pipe in pipes:
-            pipe.move()
-
-            # check for collision
-            for bird in birds:
-                if pipe.collide(bird):
-                    GE[birds.index(bird)].fitness -= 1
-                    nets.pop(birds.index(bird))
-                    GE.pop(birds.index(bird))
-                    birds.pop(birds.index(bird))
-
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                remove.append(pipe)
-
-            if not pipe.passed and pipe.x < bird.x:
-                pipe.passed = True
-                add_pipe = True
-
-        if add_pipe:
-            score += 1
-
-            # give more reward for passing through a pipe (not required)
-            for genome in GE:
-                genome.fitness += 5
-            pipes.append(Pipe(WIN_WIDTH, random.randint(180, 200)))
-
-        for pipe in remove:
-            pipes.remove(pipe)
-
-        for bird in birds:
-            if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:
-                nets.pop(birds.index(bird))
-                GE.pop(birds.index(bird))
-                birds.pop(birds.index(bird))
-
-        draw_window(WIN, birds, pipes, base, score, GEN, pipe_idx)
-
-        # break if score gets large enough
-        if score > 75:
+        if policy.stop(env, fitness):
             break
 
+    policy.finish(env)
+    return fitness
+
+
+# draws the snapshots sent to the render thread, the animation
+# of the birds carries over from one snapshot to the next
+class SnapshotDrawer:
+    def __init__(self):
+        self.animation = None
+
+    def __call__(self, win, snapshot):
+        birds = snapshot[0]
+        if self.animation is not None and len(self.animation[0]) == len(birds.alive):
+            birds.img_count, birds.frame = self.animation
+        draw_window(win, *snapshot)
+        self.animation = (birds.img_count, birds.frame)
+
 
-# Create the population, which is the top-level object for a NEAT run
-def train_neat_AI(config_file):
-    P = neat.Population(config_file)
+# play a shard of the population in a worker process, sending the profile
+# and the worker's copy of the policy back with the fitness
+def play_shard(GE, config, seed, policy):
+    profiler = FrameProfiler()
+    return play(GE, config, seed, profiler=profiler, policy=policy), profiler, policy
+
+
+# seed of the pipes of the current generation, None for random pipes
+def course_seed(seed):
+    if seed is None:
+        return None
+    return seed if SAME_COURSE else seed + GEN
+
+
+# the genomes that still have to play on the course and their cache keys, the
+# others (e.g. unchanged elites) get the fitness they had on it before
+def uncached_genomes(GE, seed):
+    if CACHE is None or seed is None or not POLICY.cacheable:
+        return GE, None
+
+    todo, keys = [], []
+    for genome in GE:
+        key = CACHE.key(genome, seed, POLICY)
+        fitness = CACHE.get(key)
+        if fitness is None:
+            todo.append(genome)
+            keys.append(key)
+        else:
+            genome.fitness = fitness
+
+    if len(todo) < len(GE):
+        print(f"Fitness of {len(GE) - len(todo)} genomes reused from the cache")
+    return todo, keys
+
+
+def cache_fitness(GE, keys):
+    if keys is not None:
+        for genome, key in zip(GE, keys):
+            CACHE.put(key, genome.fitness)
+
+
+# runs the simulation of the current population of birds and sets their fitness
+def eval_genomes(genomes, config):
+    global GEN
+    GEN += 1
+
+    GE = [genome for genome_id, genome in genomes]
+    seed = course_seed(SEED)
+    recorder = EpisodeRecorder(seed) if RECORD_DIR else None
+
+    # a recorded generation plays entirely
+    todo, keys = (GE, None) if recorder is not None else uncached_genomes(GE, seed)
+    if not todo:
+        return
+
+    fitness = play(todo, config, seed, draw=not HEADLESS and VIEWER is None,
+                   profiler=PROFILER, viewer=VIEWER, recorder=recorder, policy=POLICY)
+
+    # save the whole generation's episode, replay.py --best shows the best bird of it
+    if recorder is not None:
+        recorder.save(os.path.join(RECORD_DIR, f"generation-{GEN - 1}.npz"),
+                      genome_ids=[genome_id for genome_id, genome in genomes], fitness=fitness)
+
+    for x, genome in enumerate(todo):
+        genome.fitness = float(fitness[x])
+    cache_fitness(todo, keys)
+
+
+# evaluates the population in a pool of processes, every worker plays its own shard
+# of the genomes in a headless world. All shards of a generation share the same seed,
+# so they see the same pipes and score exactly as if the birds had played together
+class ShardedEvaluator:
+    def __init__(self, num_workers, seed=None):
+        self.num_workers = num_workers
+        self.seed = random.randrange(2 ** 31) if seed is None else seed
+        self.pool = multiprocessing.Pool(num_workers)
+
+    def __call__(self, genomes, config):
+        global GEN
+        GEN += 1
+
+        seed = course_seed(self.seed)
+        GE, keys = uncached_genomes([genome for genome_id, genome in genomes], seed)
+        shards = [GE[i::self.num_workers] for i in range(self.num_workers)]
+        shards = [shard for shard in shards if shard]
+        results = self.pool.starmap(play_shard, [(shard, config, seed, POLICY) for shard in shards])
+
+        for shard, (fitness, profiler, policy) in zip(shards, results):
+            PROFILER.merge(profiler)
+            POLICY.merge(policy)
+            for genome, value in zip(shard, fitness):
+                genome.fitness = float(value)
+        cache_fitness(GE, keys)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+# Create the population, which is the top-level object for a NEAT run,
+# or restore it from the latest checkpoint when resuming
+def train_neat_AI(config_file, workers=1, resume=False, checkpoint_dir="checkpoints",
+                  checkpoint_every=5, checkpoint_seconds=None, profile=False, profile_out=None,
+                  render_fps=None, metrics_path=None):
+    global GEN, VIEWER
+
+    checkpoint = AtomicCheckpointer.latest_checkpoint(checkpoint_dir) if resume else None
+    if checkpoint:
+        print("Resuming from", checkpoint)
+        P = AtomicCheckpointer.restore_checkpoint(checkpoint)
+    else:
+        P = neat.Population(config_file)
+    GEN = P.generation
 
     # Add a stdout reporter to show progress in the terminal.
     P.add_reporter(neat.StdOutReporter(True))
     stats = neat.StatisticsReporter()
     P.add_reporter(stats)
 
-    # Run for up to 20 generations.
-    winner = P.run(eval_genomes, 20)
+    # time spent in each phase of the frame loop, per generation
+    if profile or profile_out:
+        P.add_reporter(ProfileReporter(PROFILER, profile_out))
+
+    # one row of metrics per generation appended to a file, after the profile
+    # reporter so the frames it counts are the ones of the generation
+    metrics = MetricsReporter(metrics_path, PROFILER) if metrics_path else None
+    if metrics:
+        P.add_reporter(metrics)
+
+    # save the population every few generations (or seconds) to resume after a crash
+    checkpointer = AtomicCheckpointer(checkpoint_every, checkpoint_seconds, checkpoint_dir)
+    checkpointer.best_genome = P.best_genome
+    checkpointer.reproduction = P.reproduction
+    checkpointer.last_generation_checkpoint = P.generation - 1
+    P.add_reporter(checkpointer)
+
+    # Run for up to GENERATIONS generations in total, on several processes if asked to
+    generations = max(GENERATIONS - P.generation, 0)
+    try:
+        if workers > 1:
+            evaluator = ShardedEvaluator(workers, SEED)
+            try:
+                winner = P.run(evaluator, generations)
+            finally:
+                evaluator.close()
+        elif render_fps:
+            VIEWER = RenderThread(get_renderer(), SnapshotDrawer(), render_fps)
+            VIEWER.start()
+            try:
+                winner = P.run(eval_genomes, generations)
+            finally:
+                VIEWER.stop()
+                VIEWER = None
+        else:
+            winner = P.run(eval_genomes, generations)
+    finally:
+        if metrics:
+            metrics.close()
     with open("./model/best.pickle", "wb") as f:
         pickle.dump(winner, f)
+    compile_genome(winner, config_file).save("./model/best.json")
 
     # show final stats
     print('\nBest genome:\n{!s}'.format(winner))
@@ -178,6 +336,52 @@ def train_neat_AI(config_file):
 
 # Path of current working directory
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train a NEAT network to play Flappy Bird")
+    display = parser.add_mutually_exclusive_group()
+    display.add_argument("--window", action="store_true", help="draw the training in a window, capped at 30 fps")
+    display.add_argument("--headless", action="store_true", help="train without a window or frame cap (the default)")
+    parser.add_argument("--workers", type=int, default=1, help="evaluate the population on this many processes (always headless)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the pipes, each generation uses seed + generation")
+    parser.add_argument("--same-course", action="store_true", help="play the pipes of --seed in every generation, unchanged genomes then reuse their fitness")
+    parser.add_argument("--cache-size", type=int, default=10000, help="genome fitness kept for reuse on the same course, 0 to always play every genome")
+    parser.add_argument("--resume", action="store_true", help="continue from the latest checkpoint")
+    parser.add_argument("--checkpoint-dir", default="checkpoints", help="where checkpoints are written")
+    parser.add_argument("--checkpoint-every", type=int, default=5, help="save a checkpoint every N generations")
+    parser.add_argument("--checkpoint-seconds", type=float, default=None, help="also save a checkpoint every N seconds")
+    parser.add_argument("--render-fps", type=float, default=None, help="draw the training in a window on a separate thread at most this many frames per second, the simulation stays uncapped")
+    parser.add_argument("--record", default=None, help="save the episode of every generation to this directory")
+    episode = parser.add_mutually_exclusive_group()
+    episode.add_argument("--max-frames", type=int, default=None, help="end every episode after this many frames")
+    episode.add_argument("--stop-when-stable", action="store_true", help="end an episode once the ranking of the 10 best birds stops changing")
+    episode.add_argument("--curriculum", type=int, default=None, metavar="SCORE", help="start with episodes capped at this score and double the cap every time a bird reaches it")
+    parser.add_argument("--profile", action="store_true", help="print the time spent in each phase of every generation")
+    parser.add_argument("--profile-out", default=None, help="also write the profile to a .csv or .json file")
+    parser.add_argument("--metrics", default=None, help="append the metrics of every generation to this .jsonl or .csv file, see metrics.py")
+    args = parser.parse_args()
+    if (args.window or args.render_fps) and args.workers > 1:
+        parser.error("--window and --render-fps need a single worker")
+    if args.render_fps and args.headless:
+        parser.error("--render-fps draws in a window, it can't be headless")
+    if args.record and args.workers > 1:
+        parser.error("--record needs a single worker")
+    if args.stop_when_stable and args.workers > 1:
+        parser.error("--stop-when-stable needs a single worker, it ranks the whole population")
+    if args.same_course and args.seed is None:
+        parser.error("--same-course needs a --seed")
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    RECORD_DIR = args.record
+    HEADLESS = not args.window
+    SEED = args.seed
+    SAME_COURSE = args.same_course
+    CACHE = FitnessCache(args.cache_size) if args.cache_size > 0 else None
+    if args.max_frames:
+        POLICY = FrameCap(args.max_frames)
+    elif args.stop_when_stable:
+        POLICY = StableRanking()
+    elif args.curriculum:
+        POLICY = Curriculum(args.curriculum)
+
     local_dir   = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
 
@@ -185,4 +389,6 @@ if __name__ == '__main__':
             neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
 
     # train model
-    train_neat_AI(confg)
\ No newline at end of file
+    train_neat_AI(confg, args.workers, args.resume, args.checkpoint_dir,
+                  args.checkpoint_every, args.checkpoint_seconds, args.profile, args.profile_out,
+                  args.render_fps, args.metrics)
\ No newline at end of file